@@ -0,0 +1,63 @@
+import os
+import sys
+import numpy as np
+
+# Get the current directory of the script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+checkers_directory = os.path.normpath(os.path.join(script_dir, "..", "checkers_game"))
+sys.path.append(checkers_directory)
+
+from checkers_agent import CheckersAgent, MATERIAL_OFFSET  # noqa: E402
+
+DATASET_PATH = os.path.normpath(os.path.join(script_dir, "..", "data_manipulation", "board_evals.csv"))
+EXPORT_PATH = os.path.join(checkers_directory, "material_estimate.npz")
+# Columns of the men and kings metrics (white's count minus black's) in the board_evals rows
+MEN_COLUMN, KINGS_COLUMN = 3, 4
+NUM_DIFFERENCES = 2 * MATERIAL_OFFSET + 1
+# Fraction of a cell's boards whose prediction must be within the cell's margin of its estimate
+MARGIN_QUANTILE = 0.999
+# Cells with fewer boards have no estimate, the model evaluates all their boards
+MIN_CELL_BOARDS = 100
+
+
+def calibrate(board_evals, quantile=MARGIN_QUANTILE, min_cell_boards=MIN_CELL_BOARDS):
+    """
+    Fits the material estimate of the agent's predictions on the given board metrics.
+
+    The estimate is a table indexed by the men and kings differences: each cell holds the mean prediction of its
+    boards and a margin, the given quantile of their distances to the mean. The model's prediction isn't monotonic
+    in the material, so a table bounds it much more tightly than a linear fit would.
+
+    Returns the estimates and margins tables, and the number of boards of each cell.
+    """
+    predictions = np.array(CheckersAgent().predict_batch(board_evals))
+    men = board_evals[:, MEN_COLUMN].astype(int) + MATERIAL_OFFSET
+    kings = board_evals[:, KINGS_COLUMN].astype(int) + MATERIAL_OFFSET
+
+    estimates = np.zeros((NUM_DIFFERENCES, NUM_DIFFERENCES))
+    margins = np.full((NUM_DIFFERENCES, NUM_DIFFERENCES), np.inf)
+    cell_boards = np.zeros((NUM_DIFFERENCES, NUM_DIFFERENCES), dtype=int)
+    for men_index, kings_index in set(zip(men.tolist(), kings.tolist())):
+        cell_predictions = predictions[(men == men_index) & (kings == kings_index)]
+        cell_boards[men_index, kings_index] = len(cell_predictions)
+        if len(cell_predictions) >= min_cell_boards:
+            estimates[men_index, kings_index] = cell_predictions.mean()
+            margins[men_index, kings_index] = np.quantile(np.abs(cell_predictions - cell_predictions.mean()), quantile)
+    return estimates, margins, cell_boards
+
+
+if __name__ == "__main__":
+    # python calibrate_lazy_eval.py [board_evals.csv] [material_estimate.npz]
+    dataset_path = sys.argv[1] if len(sys.argv) > 1 else DATASET_PATH
+    export_path = sys.argv[2] if len(sys.argv) > 2 else EXPORT_PATH
+
+    # The rows are the 11 board metrics followed by the game's outcome
+    dataset = np.loadtxt(dataset_path, delimiter=',', ndmin=2)[:, :11]
+    estimates, margins, cell_boards = calibrate(dataset)
+    np.savez(export_path, estimates=estimates, margins=margins)
+
+    calibrated = np.isfinite(margins)
+    covered = cell_boards[calibrated].sum()
+    print(f"Calibrated {calibrated.sum()} cells on {len(dataset)} boards, {covered / len(dataset):.1%} of them in "
+          f"calibrated cells")
+    print(f"Margins: median {np.median(margins[calibrated]):.3f}, max {margins[calibrated].max():.3f}")
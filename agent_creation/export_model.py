@@ -0,0 +1,79 @@
+import os
+import sys
+import joblib
+import warnings
+import numpy as np
+import torch
+
+# Get the current directory of the script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_PATH = os.path.join(script_dir, "agent_model.pth")
+SCALER_PATH = os.path.join(script_dir, "scaler.pkl")
+EXPORT_PATH = os.path.normpath(os.path.join(script_dir, "..", "checkers_game", "agent_model.npz"))
+# Number of random feature vectors the exported weights are checked on
+NUM_CHECK_SAMPLES = 10000
+
+
+def export_model(model_path, export_path, scaler_path=SCALER_PATH):
+    """
+    Saves the weights of the trained model's linear layers to an .npz file, read by CheckersAgent without torch.
+
+    The model is an nn.Sequential of linear layers with a ReLU between each two of them. The mean and scale of the
+    scaler, which standardizes the first feature only, are saved with them, so that the game folds the scaler into
+    the first layer without loading it with scikit-learn.
+    """
+    model = torch.load(model_path, weights_only=False)
+    with warnings.catch_warnings():
+        # The scaler may have been pickled by another scikit-learn version
+        warnings.simplefilter("ignore")
+        scaler = joblib.load(scaler_path)
+    export_layers(model, export_path, scaler_mean=scaler.mean_[0], scaler_scale=scaler.scale_[0])
+    return model
+
+
+def export_layers(model, export_path, **scaler_parameters):
+    """
+    Saves the weights of the given model's linear layers to an .npz file, in the format read by CheckersAgent,
+    along with the given scaler_mean and scaler_scale if the model's inputs are scaled
+    """
+    linear_layers = [layer for layer in model if isinstance(layer, torch.nn.Linear)]
+
+    arrays = dict(scaler_parameters)
+    for i, layer in enumerate(linear_layers):
+        arrays[f"weight_{i}"] = layer.weight.detach().numpy().astype(np.float32)
+        arrays[f"bias_{i}"] = layer.bias.detach().numpy().astype(np.float32)
+    np.savez(export_path, **arrays)
+
+
+def check_export(model, export_path):
+    """
+    Returns the largest difference between the model's outputs and the outputs computed from the exported weights
+    """
+    with np.load(export_path) as arrays:
+        num_layers = sum(name.startswith("weight_") for name in arrays.files)
+        layers = [(arrays[f"weight_{i}"], arrays[f"bias_{i}"]) for i in range(num_layers)]
+
+    rng = np.random.default_rng(0)
+    # Feature values in the ranges of the board metrics
+    inputs = rng.uniform(-3, 12, size=(NUM_CHECK_SAMPLES, layers[0][0].shape[1])).astype(np.float32)
+
+    with torch.no_grad():
+        expected = model(torch.tensor(inputs)).numpy()
+
+    outputs = inputs
+    for i, (weight, bias) in enumerate(layers):
+        outputs = outputs @ weight.T + bias
+        if i < num_layers - 1:
+            outputs = np.maximum(outputs, 0)
+
+    return float(np.max(np.abs(outputs - expected)))
+
+
+if __name__ == "__main__":
+    model_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    export_path = sys.argv[2] if len(sys.argv) > 2 else EXPORT_PATH
+
+    model = export_model(model_path, export_path)
+    max_difference = check_export(model, export_path)
+    print(f"Exported {model_path} to {export_path}, max difference with torch: {max_difference:.2e}")
@@ -0,0 +1,111 @@
+import os
+import sys
+import numpy as np
+import torch
+
+# Get the current directory of the script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+checkers_directory = os.path.normpath(os.path.join(script_dir, "..", "checkers_game"))
+sys.path.append(checkers_directory)
+
+from checkers_agent import CheckersAgent  # noqa: E402
+
+DATASET_PATH = os.path.normpath(os.path.join(script_dir, "..", "data_manipulation", "board_evals.csv"))
+EXPORT_PATH = os.path.join(checkers_directory, "agent_model_int8.npz")
+# Largest magnitude of the int8 weights and activations
+INT8_MAX = 127
+# The score metric (first column) is this combination of the other ten, see board_evaluator.get_metrics
+SCORE_WEIGHTS = np.array([4, 1, 1, 3, 1, 2, 3, 2, 3, 100])
+
+
+def get_folded_layers():
+    """
+    Returns the (weight, bias) pairs of agent_model.pth's linear layers, with the scaler folded into the first one,
+    as float64 arrays. The weights have torch's (outputs, inputs) shape.
+    """
+    # The torch agent loads agent_model.pth and folds the scaler into it
+    model = CheckersAgent(use_torch=True).model
+    return [(layer.weight.detach().numpy().astype(np.float64), layer.bias.detach().numpy().astype(np.float64))
+            for layer in model if isinstance(layer, torch.nn.Linear)]
+
+
+def fold_score_column(weight):
+    """
+    Moves the score's weights onto the metrics it's made of. The score is much larger than the other metrics, so
+    its weights are much smaller than theirs and would be rounded away by a scale shared with them.
+    """
+    folded_weight = weight.copy()
+    folded_weight[:, 1:] += weight[:, :1] * SCORE_WEIGHTS
+    folded_weight[:, 0] = 0
+    return folded_weight
+
+
+def calibrate(layers, board_evals):
+    """
+    Returns the input scales of each layer, one per input. The first layer takes the board metrics, which are
+    integers, as they are. A hidden unit's scale maps its largest activation over the given boards to INT8_MAX.
+    """
+    input_scales = [np.ones(board_evals.shape[1])]
+    outputs = board_evals
+    for weight, bias in layers[:-1]:
+        outputs = np.maximum(outputs @ weight.T + bias, 0)
+        # Units that are never active get a tiny scale, their activations are then quantized to 0 or INT8_MAX
+        input_scales.append(np.maximum(outputs.max(axis=0), 1e-8) / INT8_MAX)
+    return input_scales
+
+
+def quantize_layer(weight, input_scales):
+    """
+    Returns the int8 weights of a layer and its scales, one per output. The input scales are folded into the
+    weights, so that the layer is applied to the quantized inputs.
+    """
+    weight = weight * input_scales
+    weight_scales = np.maximum(np.abs(weight).max(axis=1), 1e-12) / INT8_MAX
+    quantized_weight = np.clip(np.rint(weight / weight_scales[:, None]), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return quantized_weight, weight_scales
+
+
+def export_quantized_model(board_evals, export_path):
+    if not np.array_equal(board_evals, np.rint(board_evals)):
+        raise ValueError("The board metrics must be integers, they are the quantized model's first inputs")
+    if not np.array_equal(board_evals[:, 0], board_evals[:, 1:] @ SCORE_WEIGHTS):
+        raise ValueError("The score metric isn't the combination of the other metrics the model is quantized for")
+
+    layers = get_folded_layers()
+    input_scales = calibrate(layers, board_evals)
+    layers[0] = (fold_score_column(layers[0][0]), layers[0][1])
+
+    arrays = {}
+    for i, ((weight, bias), layer_input_scales) in enumerate(zip(layers, input_scales)):
+        arrays[f"weight_{i}"], arrays[f"weight_scales_{i}"] = quantize_layer(weight, layer_input_scales)
+        arrays[f"bias_{i}"] = bias.astype(np.float32)
+        arrays[f"input_scales_{i}"] = layer_input_scales
+    np.savez(export_path, **arrays)
+
+
+def report_accuracy(board_evals, outcomes):
+    """
+    Compares the quantized agent's predictions with the float agent's ones on the given boards
+    """
+    float_predictions = np.array(CheckersAgent().predict_batch(board_evals))
+    quantized_predictions = np.array(CheckersAgent(quantized=True).predict_batch(board_evals))
+    differences = np.abs(quantized_predictions - float_predictions)
+    print(f"Difference with the float model: mean {differences.mean():.2e}, max {differences.max():.2e}")
+    print(f"Same sign as the float model on {np.mean(np.sign(quantized_predictions) == np.sign(float_predictions)):.2%}"
+          f" of the boards")
+    for name, predictions in (("float", float_predictions), ("int8", quantized_predictions)):
+        print(f"Mean squared error against the outcomes, {name} model: {np.mean((predictions - outcomes) ** 2):.5f}")
+
+
+if __name__ == "__main__":
+    # python quantize_model.py [board_evals.csv]
+    dataset_path = sys.argv[1] if len(sys.argv) > 1 else DATASET_PATH
+
+    # The rows are the 11 board metrics followed by the game's outcome
+    dataset = np.loadtxt(dataset_path, delimiter=',', ndmin=2)
+    board_evals, outcomes = dataset[:, :11], dataset[:, 11]
+
+    # The quantized agent loads the exported model, its accuracy is then reported on the calibration boards
+    export_quantized_model(board_evals, EXPORT_PATH)
+    print(f"Exported the quantized model to {EXPORT_PATH}, calibrated on {len(dataset)} boards")
+    report_accuracy(board_evals, outcomes)
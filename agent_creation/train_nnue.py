@@ -0,0 +1,106 @@
+import os
+import sys
+import numpy as np
+import torch
+import torch.nn as nn
+
+from export_model import export_layers, check_export
+
+# Get the current directory of the script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+DATA_DIR = os.path.normpath(os.path.join(script_dir, "..", "data_manipulation"))
+EVALS_PATH = os.path.join(DATA_DIR, "board_evals.csv")
+POSITIONS_PATH = os.path.join(DATA_DIR, "board_positions.csv")
+MODEL_PATH = os.path.join(script_dir, "nnue_model.pth")
+EXPORT_PATH = os.path.normpath(os.path.join(script_dir, "..", "checkers_game", "nnue_model.npz"))
+
+# Values of the board arrays' squares for each piece type, in the order of the bitboard's piece types (white man,
+# white king, black man, black king): feature 32 * piece type + index is set when that piece stands on that square
+PIECE_VALUES = (1, 3, -1, -3)
+NUM_FEATURES = 32 * len(PIECE_VALUES)
+# Outputs of the first layer, which the positions keep up to date as moves are played, and of the hidden layer
+ACCUMULATOR_SIZE = 64
+HIDDEN_SIZE = 16
+
+LEARNING_RATE = 0.01
+NUM_EPOCHS = 150
+TEST_FRACTION = 0.2
+
+
+def load_dataset(evals_path, positions_path):
+    """
+    Returns the occupancy features of the boards and the outcomes of their games, from the point of view of the
+    team that just moved, read from the data_manipulation output
+    """
+    outcomes = np.loadtxt(evals_path, delimiter=',', ndmin=2)[:, -1]
+    positions = np.loadtxt(positions_path, delimiter=',', ndmin=2, dtype=int)
+    return get_features(positions), outcomes.astype(np.float32)
+
+
+def get_features(positions):
+    """
+    Returns the (N, 128) occupancy features of an (N, 32) array of the boards' playable squares
+    """
+    return np.concatenate([positions == value for value in PIECE_VALUES], axis=1).astype(np.float32)
+
+
+def train(features, outcomes, seed=0):
+    """
+    Trains the occupancy network on the given boards, with the same loss and optimizer as the metrics network
+    """
+    torch.manual_seed(seed)
+    model = nn.Sequential(
+        nn.Linear(NUM_FEATURES, ACCUMULATOR_SIZE),
+        nn.ReLU(),
+        nn.Linear(ACCUMULATOR_SIZE, HIDDEN_SIZE),
+        nn.ReLU(),
+        nn.Linear(HIDDEN_SIZE, 1)
+    )
+    criterion = nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=LEARNING_RATE)
+
+    inputs = torch.tensor(features)
+    labels = torch.tensor(outcomes.reshape(-1, 1))
+    for epoch in range(NUM_EPOCHS):
+        loss = criterion(model(inputs), labels)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+        if (epoch + 1) % 10 == 0:
+            print(f'Epoch [{epoch + 1}/{NUM_EPOCHS}], Loss: {loss.item():.4f}')
+
+    return model
+
+
+def evaluate(model, features, outcomes):
+    """
+    Returns the mean squared error of the model on the given boards, and how often it predicts the winner of the
+    decisive games
+    """
+    with torch.no_grad():
+        predictions = model(torch.tensor(features)).numpy().flatten()
+    decisive = outcomes != 0
+    accuracy = np.mean(np.sign(predictions[decisive]) == outcomes[decisive]) if decisive.any() else float('nan')
+    return float(np.mean((predictions - outcomes) ** 2)), float(accuracy)
+
+
+if __name__ == "__main__":
+    # python train_nnue.py [board_evals.csv] [board_positions.csv]
+    evals_path = sys.argv[1] if len(sys.argv) > 1 else EVALS_PATH
+    positions_path = sys.argv[2] if len(sys.argv) > 2 else POSITIONS_PATH
+
+    features, outcomes = load_dataset(evals_path, positions_path)
+    permutation = np.random.default_rng(0).permutation(len(outcomes))
+    num_test = int(TEST_FRACTION * len(outcomes))
+    test, training = permutation[:num_test], permutation[num_test:]
+
+    model = train(features[training], outcomes[training])
+    test_loss, test_accuracy = evaluate(model, features[test], outcomes[test])
+    print(f"Test loss {test_loss:.4f}, winner predicted in {test_accuracy:.1%} of the decisive games' boards")
+
+    torch.save(model, MODEL_PATH)
+    export_layers(model, EXPORT_PATH)
+    max_difference = check_export(model, EXPORT_PATH)
+    print(f"Exported the model to {EXPORT_PATH}, max difference with torch: {max_difference:.2e}")
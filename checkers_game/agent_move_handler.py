@@ -1,217 +1,507 @@
+import time
+import threading
+import concurrent.futures
+import pygame
 from move_handler import MoveHandler
-from pawn import Pawn
-from checkers_agent import CheckersAgent
-import board_evaluator
+from bitboard import BitBoard, SQUARE_NUMBERS, unpack_counts
+from checkers_agent import CheckersAgent, METRICS_EVALUATOR, NNUE_EVALUATOR
+from transposition_table import TranspositionTable, EXACT
+from move_orderer import MoveOrderer
+from evaluation_cache import EvaluationCache, DEFAULT_CACHE_SIZE
+import parallel_search
+import bitboard_evaluator
+import constants
+
+# Number of searched nodes between two checks of the search's deadline
+TIME_CHECK_INTERVAL = 64
+# Time (in seconds) between two checks for a cancellation while waiting for the worker processes
+RESULT_POLL_INTERVAL = 0.05
+# Maximal search depth of each difficulty, which sets the agent's strength
+DIFFICULTY_MAX_DEPTHS = {"EASY": 1, "MEDIUM": 3, "HARD": 5}
+# Time budget per move (in seconds) of each difficulty, the search returns the move of its last completed iteration
+# when it runs out before the maximal depth
+DIFFICULTY_TIME_BUDGETS = {"EASY": 0.05, "MEDIUM": 0.5, "HARD": 2.0}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchCancelled(Exception):
+    pass
 
 
 class AgentMoveHandler(MoveHandler):
 
-    def __init__(self, difficulty):
+    def __init__(self, difficulty, transposition_table_size_mb=16, num_workers=1,
+                 evaluation_cache_size=DEFAULT_CACHE_SIZE, evaluator=METRICS_EVALUATOR, quantized=False):
         super().__init__()
-        self.agent = CheckersAgent()
+        self.agent = CheckersAgent(evaluator=evaluator, quantized=quantized)
+        # The agent's predictions, reused across sibling subtrees, iterations and the moves of a game
+        self.evaluation_cache = EvaluationCache(evaluation_cache_size)
+        self.transposition_table = TranspositionTable(transposition_table_size_mb)
+        self.move_orderer = MoveOrderer()
         self.max_depth = None
+        self.time_budget = None
         self.difficulty = None
         self.set_difficulty(difficulty)
 
+        # Depth of the current iteration of the search, and the time by which the search must end, on the monotonic
+        # clock that the worker processes share
+        self.search_depth = None
+        self.deadline = None
+        # Counts the searches of a move, so that a worker process knows when a task starts a new one
+        self.root_search_id = 0
+        self.nodes = 0
+        # In a worker process, the best root score found by any worker, polled between nodes into the lower bound
+        # of every node's window
+        self.shared_root_alpha = None
+        self.alpha_floor = float('-inf')
+
+        # Background search state, each search is tagged with an id so that a cancelled search's result is ignored
+        self.search_thread = None
+        self.search_id = 0
+        self.cancel_event = threading.Event()
+
+        # With more than one worker, the root moves are split across a pool of processes
+        self.num_workers = num_workers
+        self.executor = None
+        self.shared_alpha = None
+        self.stop_event = None
+        if num_workers > 1:
+            self.executor, self.shared_alpha, self.stop_event = parallel_search.create_executor(
+                num_workers, difficulty, evaluator, quantized)
+
     def set_difficulty(self, difficulty):
+        """
+        Sets the maximal search depth and the time budget per move (in seconds) of the given difficulty
+        """
         self.difficulty = difficulty
-        if difficulty == "EASY":
-            self.max_depth = 1
-        elif difficulty == "MEDIUM":
-            self.max_depth = 3
-        else:
-            self.max_depth = 5
+        self.max_depth = DIFFICULTY_MAX_DEPTHS.get(difficulty, DIFFICULTY_MAX_DEPTHS["HARD"])
+        self.time_budget = DIFFICULTY_TIME_BUDGETS.get(difficulty, DIFFICULTY_TIME_BUDGETS["HARD"])
 
     def play(self, board, ui):
-        depth = 0
-        team = board.white_team
+        # The search runs on a compact copy of the position, the board is only updated with the chosen move
+        move = self.find_move(BitBoard.from_board(board))
+        self.play_move(board, move, ui)
+
+    def start_search(self, board):
+        """
+        Starts searching the agent's move in a background thread, on a snapshot of the board.
+
+        When the search is over, its move is posted as an AGENT_MOVE_EVENT tagged with the returned search id. If the
+        search failed, the event's move is None and its error is the exception that ended the search.
+        """
+        self.cancel_search()
+        self.search_id += 1
+        position = BitBoard.from_board(board)
+        self.search_thread = threading.Thread(target=self.search_in_background, args=(position, self.search_id),
+                                              daemon=True)
+        self.search_thread.start()
+        return self.search_id
+
+    def search_in_background(self, position, search_id):
+        move, error = None, None
+        try:
+            move = self.find_move(position)
+        except SearchCancelled:
+            return
+        except Exception as search_error:
+            # The error is posted instead of the move, the game would otherwise wait forever for it
+            error = search_error
+
+        pygame.event.post(pygame.event.Event(constants.AGENT_MOVE_EVENT, search_id=search_id, move=move, error=error))
+
+    def cancel_search(self):
+        """
+        Stops the background search, if one is running, and waits for its thread to end
+        """
+        if self.search_thread is None:
+            return
+
+        self.cancel_event.set()
+        self.search_thread.join()
+        self.search_thread = None
+        self.cancel_event.clear()
+
+    def find_move(self, position):
+        """
+        Returns the move the agent plays from the given position, a multiple capture being a single move
+        """
+        self.transposition_table.new_search()
+        self.move_orderer.new_search()
+        self.root_search_id += 1
+        self.deadline = time.monotonic() + self.time_budget
+        self.attach_accumulator(position)
+
+        moves = position.get_legal_moves(is_white=True)
+        return self.iterative_deepening(position, moves)
+
+    def play_move(self, board, move, ui):
+        path = move.path
+        for source, target in zip(path, path[1:]):
+            pawn = board.get_occupying_pawn(SQUARE_NUMBERS[source])
+            if move.captured:
+                self.eat(board, pawn, SQUARE_NUMBERS[target], ui)
+            else:
+                self.move(board, pawn, SQUARE_NUMBERS[target], ui)
+
+    def iterative_deepening(self, position, moves):
+        """
+        Searches the root moves one ply deeper at a time, until the maximal depth or the deadline is reached.
+
+        Returns the best move of the last completed iteration. The first iteration is never interrupted, so
+        there is always a move to return.
+        """
+        if len(moves) == 1:
+            return moves[0]
+
+        find_best_root_move = self.find_best_move_in_parallel if self.executor else self.find_best_move
 
-        pawns_and_captures = self.find_pawns_with_capture_moves(board, team)
-        # Capture possible
-        if pawns_and_captures:
-            self.play_capture(board, pawns_and_captures, depth, ui)
-        # No captures possible
-        else:
-            pawns_and_moves = self.find_pawns_with_moves(board, team)
-            pawn, next_square_number = self.find_best_move(board, pawns_and_moves, depth, ui)
-            self.move(board, pawn, next_square_number, ui)
-
-    def find_best_move(self, board, pawns_and_moves, depth, ui):
+        depth = 0
+        root_ply = position.ply
+        best_move = None
+        for search_depth in range(1, self.max_depth + 1):
+            self.search_depth = search_depth
+            # Search the previous iteration's best move first
+            moves = self.move_orderer.order(moves, best_move, depth, position, is_white=True)
+            try:
+                best_move = find_best_root_move(position, moves, depth)
+            except SearchTimeout:
+                # Take back the moves of the interrupted line
+                while position.ply > root_ply:
+                    position.undo_move()
+                break
+
+        return best_move
+
+    def check_deadline(self):
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            if self.cancel_event.is_set():
+                raise SearchCancelled
+            if self.is_past_deadline():
+                raise SearchTimeout
+            if self.shared_root_alpha is not None:
+                self.alpha_floor = self.shared_root_alpha.value
+
+    def is_past_deadline(self):
+        # The first iteration always completes
+        return self.search_depth > 1 and time.monotonic() > self.deadline
+
+    def find_best_move(self, position, moves, depth):
         best_move_score = float('-inf')
-        pawn_with_best_move = None
-        best_move_square = None
-
-        for pawn, next_possible_square_numbers in pawns_and_moves.items():
-            for next_square_number in next_possible_square_numbers:
-                alpha = float('-inf')  # Initialize alpha to negative infinity
-                beta = float('inf')  # Initialize beta to positive infinity
-
-                board_copy, _ = self.make_move_copy(board, pawn, next_square_number, is_capture=False, ui=ui)
-                move_score = self.minimax(board_copy, depth + 1, alpha, beta, is_maximizing_turn=False, ui=ui)
-
-                best_move_score, pawn_with_best_move, best_move_square = self.update_best_move(best_move_score,
-                                                                                               move_score, pawn,
-                                                                                               next_square_number,
-                                                                                               pawn_with_best_move,
-                                                                                               best_move_square)
-
-        return pawn_with_best_move, best_move_square
-
-    def play_capture(self, board, pawns_and_captures, depth, ui):
-        pawn, jump_square_number = self.find_best_capture_move(board, pawns_and_captures, depth, ui)
-
-        self.eat(board, pawn, jump_square_number, ui)
-
-        next_jumping_squares = pawn.get_next_jumping_squares(board)
-        if next_jumping_squares:
-            pawns_and_captures = {pawn: next_jumping_squares}
-            self.play_capture(board, pawns_and_captures, depth, ui)
-
-    def find_best_capture_move(self, board, pawns_and_captures, depth, ui):
-        best_capture_move_score = float('-inf')
-        pawn_with_best_capture_move = None
-        best_jump_square = None
-
-        for pawn, possible_jump_square_numbers in pawns_and_captures.items():
-            for jump_square_number in possible_jump_square_numbers:
-                alpha = float('-inf')  # Initialize alpha to negative infinity
-                beta = float('inf')  # Initialize beta to positive infinity
-
-                board_copy, pawn_copy = self.make_move_copy(board, pawn, jump_square_number, is_capture=True, ui=ui)
-                next_jumping_squares = pawn_copy.get_next_jumping_squares(board_copy)
-
-                capture_move_score = self.get_move_score(board_copy, depth, alpha, beta, pawn_copy,
-                                                         next_jumping_squares, is_maximizing_turn=True, ui=ui)
-
-                best_capture_move_score, pawn_with_best_capture_move, best_jump_square = self.update_best_move(
-                    best_capture_move_score,
-                    capture_move_score, pawn,
-                    jump_square_number,
-                    pawn_with_best_capture_move,
-                    best_jump_square)
-
-        return pawn_with_best_capture_move, best_jump_square
+        best_move = None
+        alpha = float('-inf')  # Initialize alpha to negative infinity
+        beta = float('inf')  # Initialize beta to positive infinity
+
+        key = position.get_key(is_white_turn=True)
+        moves = self.put_hash_move_first(moves, self.get_hash_move(key))
+        leaf_scores = self.get_leaf_scores(position, moves, depth, alpha, beta, is_maximizing_turn=True)
+        for move in moves:
+            if move in leaf_scores:
+                move_score = leaf_scores[move]
+            else:
+                position.apply_move(move, is_white=True)
+                move_score = self.minimax(position, depth + 1, alpha, beta, is_maximizing_turn=False)
+                position.undo_move()
+
+            best_move_score, best_move = self.update_best_move(best_move_score, move_score, move, best_move)
+            # Later moves only need to be proven worse than the best one so far
+            alpha = max(alpha, move_score)
+
+        # The root window is never narrowed from above, so the best score is exact
+        self.transposition_table.store(key, self.search_depth - depth, EXACT, best_move_score, best_move)
+        return best_move
+
+    def find_best_move_in_parallel(self, position, moves, depth):
+        """
+        Searches the first root move in this process, then splits the others across the worker processes.
+
+        All searches start from the best root score found so far, and the workers raise it as they find better
+        moves.
+        """
+        first_move, other_moves = moves[0], moves[1:]
+        position.apply_move(first_move, is_white=True)
+        first_move_score = self.minimax(position, depth + 1, float('-inf'), float('inf'), is_maximizing_turn=False)
+        position.undo_move()
+        self.shared_alpha.value = first_move_score
+
+        # The first iteration always completes
+        deadline = self.deadline if self.search_depth > 1 else float('inf')
+        futures = [self.executor.submit(parallel_search.search_root_move, position.white, position.black,
+                                        position.kings, move, depth, self.search_depth, deadline,
+                                        self.root_search_id)
+                   for move in other_moves]
+
+        best_move_score, best_move = first_move_score, first_move
+        try:
+            for move, future in zip(other_moves, futures):
+                move_score = self.wait_for_result(future)
+                # The moves that fail low are worse than the best one
+                if move_score is not None:
+                    best_move_score, best_move = self.update_best_move(best_move_score, move_score, move, best_move)
+        except (SearchTimeout, SearchCancelled):
+            self.stop_workers(futures)
+            raise
+
+        key = position.get_key(is_white_turn=True)
+        self.transposition_table.store(key, self.search_depth - depth, EXACT, best_move_score, best_move)
+        return best_move
+
+    def wait_for_result(self, future):
+        """
+        Returns the future's result, or raises once the search is cancelled or its deadline has passed, whether or
+        not the future's root move has started
+        """
+        while True:
+            try:
+                return future.result(timeout=RESULT_POLL_INTERVAL)
+            except concurrent.futures.TimeoutError:
+                if self.cancel_event.is_set():
+                    raise SearchCancelled
+                if self.is_past_deadline():
+                    raise SearchTimeout
+
+    def stop_workers(self, futures):
+        """
+        Cancels the root moves the workers haven't started and stops the searches they are running, then waits for
+        all of them to end, so that none keeps running into the next search
+        """
+        for future in futures:
+            future.cancel()
+        self.stop_event.set()
+        concurrent.futures.wait(futures)
+        self.stop_event.clear()
+
+    def close(self):
+        self.cancel_search()
+        if self.executor:
+            self.stop_event.set()
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
 
     @staticmethod
-    def update_best_move(best_move_score, move_score, pawn, next_square_number, pawn_with_best_move,
-                         best_move_square):
+    def update_best_move(best_move_score, move_score, move, best_move):
         if move_score > best_move_score:
-            return move_score, pawn, next_square_number
-        else:
-            return best_move_score, pawn_with_best_move, best_move_square
-
-    def minimax(self, board, depth, alpha, beta, is_maximizing_turn, ui,
-                is_consecutive_capture=False, capturing_pawn=None):
-        # Base case
-        if self.is_terminal_node(board, depth):
-            return self.evaluate_board(board)
-
-        team, best_move_score = self.initialize_minimax_variables(is_maximizing_turn, board)
-        pruned = False
-
-        pawns_and_captures = self.get_pawns_and_captures(board, team, is_consecutive_capture, capturing_pawn)
-        if pawns_and_captures:
-            for pawn, possible_jump_square_numbers in pawns_and_captures.items():
-                for jump_square_number in possible_jump_square_numbers:
-                    board_copy, pawn_copy = self.make_move_copy(board, pawn, jump_square_number, is_capture=True, ui=ui)
-                    next_jumping_squares = pawn_copy.get_next_jumping_squares(board_copy)
-
-                    move_score = self.get_move_score(board_copy, depth, alpha, beta, pawn_copy, next_jumping_squares,
-                                                     is_maximizing_turn, ui)
-                    best_move_score = self.update_best_move_score(is_maximizing_turn, best_move_score, move_score)
-
-                    if is_maximizing_turn:
-                        alpha = max(alpha, move_score)
-                    else:
-                        beta = min(beta, move_score)
-                    if beta <= alpha:
-                        pruned = True
-                        break
-
-                if pruned:
-                    break
-
-        # No possible captures
+            return move_score, move
         else:
-            pawns_and_moves = self.find_pawns_with_moves(board, team)
-            for pawn, next_possible_square_numbers in pawns_and_moves.items():
-                for next_square_number in next_possible_square_numbers:
-                    board_copy, pawn_copy = self.make_move_copy(board, pawn, next_square_number, is_capture=False,
-                                                                ui=ui)
-                    move_score = self.get_move_score(board_copy, depth, alpha, beta, pawn_copy, None,
-                                                     is_maximizing_turn, ui)
-                    best_move_score = self.update_best_move_score(is_maximizing_turn, best_move_score, move_score)
-
-                    if is_maximizing_turn:
-                        alpha = max(alpha, move_score)
-                    else:
-                        beta = min(beta, move_score)
-                    if beta <= alpha:
-                        pruned = True
-                        break
-
-                if pruned:
-                    break
-
+            return best_move_score, best_move
+
+    def minimax(self, position, depth, alpha, beta, is_maximizing_turn):
+        self.check_deadline()
+        # A worker's root move only matters if it beats the best root score of all the workers
+        alpha = max(alpha, self.alpha_floor)
+
+        remaining_depth = self.search_depth - depth
+        key = position.get_key(is_maximizing_turn)
+        hash_move = None
+        slot = self.transposition_table.probe(key)
+        if slot is not None:
+            stored_score = self.transposition_table.get_cutoff_score(slot, remaining_depth, alpha, beta)
+            if stored_score is not None:
+                return stored_score
+            hash_move = self.transposition_table.best_moves[slot]
+
+        original_alpha, original_beta = alpha, beta
+
+        # Search horizon, only pending captures are played out before evaluating
+        if depth == self.search_depth:
+            score = self.quiescence(position, depth, alpha, beta, is_maximizing_turn)
+            bound_type = TranspositionTable.get_bound_type(score, original_alpha, original_beta)
+            self.transposition_table.store(key, remaining_depth, bound_type, score, None)
+            return score
+
+        moves = position.get_legal_moves(is_maximizing_turn)
+        # Base case, the side to move has no legal move
+        if not moves:
+            score = self.evaluate_board(position)
+            self.transposition_table.store(key, remaining_depth, EXACT, score, None)
+            return score
+
+        best_move_score = float('-inf') if is_maximizing_turn else float('inf')
+        best_move = None
+        moves = self.move_orderer.order(moves, hash_move, depth, position, is_maximizing_turn)
+
+        leaf_scores = {}
+        for move_number, move in enumerate(moves):
+            # The first move often cuts off on its own, once it hasn't the other quiet children are batched
+            if move_number == 1:
+                leaf_scores = self.get_leaf_scores(position, moves[1:], depth, alpha, beta, is_maximizing_turn)
+            if move in leaf_scores:
+                move_score = leaf_scores[move]
+            else:
+                position.apply_move(move, is_maximizing_turn)
+                move_score = self.minimax(position, depth + 1, alpha, beta,
+                                          is_maximizing_turn=not is_maximizing_turn)
+                position.undo_move()
+            if best_move is None or self.is_better_score(is_maximizing_turn, move_score, best_move_score):
+                best_move_score, best_move = move_score, move
+
+            if is_maximizing_turn:
+                alpha = max(alpha, move_score)
+            else:
+                beta = min(beta, move_score)
+            if beta <= alpha:
+                self.move_orderer.record_cutoff(move, depth, remaining_depth, is_maximizing_turn)
+                break
+
+        # The children may have been searched with a higher floor, their scores below it are only upper bounds
+        bound_type = TranspositionTable.get_bound_type(best_move_score, max(original_alpha, self.alpha_floor),
+                                                       original_beta)
+        self.transposition_table.store(key, remaining_depth, bound_type, best_move_score, best_move)
         return best_move_score
 
-    def is_terminal_node(self, board, depth):
-        return (depth == self.max_depth or
-                self.is_losing_team(board, board.black_team) or
-                self.is_losing_team(board, board.white_team))
+    def get_leaf_scores(self, position, moves, depth, alpha, beta, is_maximizing_turn):
+        """
+        Evaluates the children of a frontier node that are quiet (no capture is pending in them), those that aren't
+        in the evaluation cache or far outside the window with a single batched prediction. The others still need
+        a quiescence search.
+
+        Returns a dictionary of the children's scores by the moves leading to them, empty below the frontier.
+        """
+        if depth + 1 != self.search_depth:
+            return {}
+
+        leaf_scores = {}
+        # Quiet children that aren't in the evaluation cache, with their cache keys
+        uncached_moves = []
+        keys = []
+        board_evals = []
+        for move in moves:
+            self.check_deadline()
+            position.apply_move(move, is_maximizing_turn)
+            if not position.get_captures(not is_maximizing_turn):
+                score = self.evaluation_cache.get(position.hash)
+                if score is None:
+                    score = self.get_lazy_bound(position, alpha, beta)
+                if score is not None:
+                    leaf_scores[move] = score
+                else:
+                    uncached_moves.append(move)
+                    keys.append(position.hash)
+                    board_evals.append(self.get_model_inputs(position))
+            position.undo_move()
+
+        if uncached_moves:
+            for move, key, score in zip(uncached_moves, keys, self.agent.predict_batch(board_evals)):
+                self.evaluation_cache.put(key, score)
+                leaf_scores[move] = score
+        return leaf_scores
+
+    def get_hash_move(self, key):
+        slot = self.transposition_table.probe(key)
+        return None if slot is None else self.transposition_table.best_moves[slot]
 
     @staticmethod
-    def initialize_minimax_variables(is_maximizing_turn, board):
-        if is_maximizing_turn:
-            team = board.white_team
-            best_move_score = float('-inf')
-        else:
-            team = board.black_team
-            best_move_score = float('inf')
-        return team, best_move_score
-
-    def get_pawns_and_captures(self, board, team, is_consecutive_capture, capturing_pawn):
-        if is_consecutive_capture:
-            next_jumping_squares = capturing_pawn.get_next_jumping_squares(board)
-            pawns_and_captures = {capturing_pawn: next_jumping_squares}
-        else:
-            pawns_and_captures = self.find_pawns_with_capture_moves(board, team)
-        return pawns_and_captures
-
-    def make_move_copy(self, board, pawn, next_square_number, is_capture, ui):
-        board_copy = board.copy()
-        pawn_copy = board_copy.get_occupying_pawn(pawn.square_number)
-        if is_capture:
-            opponent_square_number = Pawn.compute_opponent_square_number(pawn_copy.square_number, next_square_number)
-            self.delete_opponent_pawn(board_copy, opponent_square_number, ui)
-        self.update_move(board_copy, pawn_copy, next_square_number, ui)
-        return board_copy, pawn_copy
-
-    def get_move_score(self, board_copy, depth, alpha, beta, pawn, next_jumping_squares, is_maximizing_turn, ui):
-        if next_jumping_squares:
-            return self.minimax(board_copy, depth, alpha, beta, is_maximizing_turn, ui, is_consecutive_capture=True,
-                                capturing_pawn=pawn)
-        else:
-            return self.minimax(board_copy, depth + 1, alpha, beta, is_maximizing_turn=not is_maximizing_turn, ui=ui)
+    def put_hash_move_first(moves, hash_move):
+        """
+        Moves the best move stored in the transposition table to the front of the move list
+        """
+        if hash_move is not None and hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+        return moves
+
+    def quiescence(self, position, depth, alpha, beta, is_maximizing_turn):
+        """
+        Extends the search beyond its horizon with capture moves only, until the position is quiet.
+
+        A quiet position stands pat with its static evaluation. As long as a capture is pending the side to move
+        must take it, so those positions are never evaluated.
+        """
+        self.check_deadline()
+
+        captures = position.get_captures(is_maximizing_turn)
+        if not captures:
+            return self.evaluate_board(position, alpha, beta)
+
+        best_move_score = float('-inf') if is_maximizing_turn else float('inf')
+        captures = self.move_orderer.order(captures, None, depth, position, is_maximizing_turn)
+        for capture in captures:
+            position.apply_move(capture, is_maximizing_turn)
+            move_score = self.quiescence(position, depth + 1, alpha, beta, not is_maximizing_turn)
+            position.undo_move()
+
+            if self.is_better_score(is_maximizing_turn, move_score, best_move_score):
+                best_move_score = move_score
+
+            if is_maximizing_turn:
+                alpha = max(alpha, move_score)
+            else:
+                beta = min(beta, move_score)
+            if beta <= alpha:
+                break
+
+        return best_move_score
 
     @staticmethod
-    def update_best_move_score(is_maximizing_turn, best_move_score, move_score):
+    def is_better_score(is_maximizing_turn, move_score, best_move_score):
         if is_maximizing_turn:
-            return max(best_move_score, move_score)
+            return move_score > best_move_score
         else:
-            return min(best_move_score, move_score)
+            return move_score < best_move_score
+
+    def evaluate_board(self, position, alpha=float('-inf'), beta=float('inf'), reverse=False):
+        """
+        Returns the agent's evaluation of the position, or a bound of it when it's far enough outside the
+        (alpha, beta) window for its exact value not to matter
+        """
+        key = EvaluationCache.get_key(position, reverse)
+        move_score = self.evaluation_cache.get(key)
+        if move_score is not None:
+            return move_score
+        if not reverse:
+            move_score = self.get_lazy_bound(position, alpha, beta)
+            if move_score is not None:
+                return move_score
 
-    def evaluate_board(self, board, reverse=False):
-        deserialized_board = board.deserialize()
         if reverse:
-            deserialized_board = board_evaluator.reverse(deserialized_board)
-        board_eval = board_evaluator.get_metrics(deserialized_board)
-        move_score = self.agent.predict(board_eval)
+            position = BitBoard(*bitboard_evaluator.reverse(position.white, position.black, position.kings))
+            self.attach_accumulator(position)
+        move_score = self.agent.predict(self.get_model_inputs(position))
+        self.evaluation_cache.put(key, move_score)
         return move_score
 
+    def get_model_inputs(self, position):
+        """
+        Returns the inputs of the agent's model for the position: the board metrics, or the accumulator of the
+        occupancy network
+        """
+        if self.agent.evaluator == NNUE_EVALUATOR:
+            return position.accumulator
+        # Same metrics as board_evaluator.get_metrics, computed on the position's masks and running counts. The
+        # frontier's batches are small, so the children are evaluated one by one on their masks.
+        return bitboard_evaluator.get_metrics(position.white, position.black, position.kings, position.counts)
+
+    def attach_accumulator(self, position):
+        """
+        Makes the position keep the occupancy network's first layer up to date, when the agent evaluates with it
+        """
+        if self.agent.evaluator == NNUE_EVALUATOR:
+            position.set_feature_weights(*self.agent.get_first_layer())
+
+    def get_lazy_bound(self, position, alpha, beta):
+        """
+        Returns a bound of the position's evaluation from the material estimate when the evaluation is outside the
+        window by more than the estimate's margin, or None if the model must evaluate the position
+        """
+        # Boards where a team has no piece left are won, which the material alone doesn't tell
+        if not position.white or not position.black:
+            return None
+        white_men, white_kings, black_men, black_kings = unpack_counts(position.counts)[:4]
+        estimate, margin = self.agent.estimate_material(white_men - black_men, white_kings - black_kings)
+        if estimate - margin >= beta:
+            return estimate - margin
+        if estimate + margin <= alpha:
+            return estimate + margin
+        return None
+
     def offer_draw(self, board):
-        agent_pos_eval = self.evaluate_board(board)
-        human_pos_eval = self.evaluate_board(board, reverse=True)
+        position = BitBoard.from_board(board)
+        self.attach_accumulator(position)
+        agent_pos_eval = self.evaluate_board(position)
+        human_pos_eval = self.evaluate_board(position, reverse=True)
         if (human_pos_eval - agent_pos_eval > 0.3 or
                 (abs(agent_pos_eval - human_pos_eval) <= 0.1 and len(board.black_team) == len(board.white_team) == 1)):
             return True
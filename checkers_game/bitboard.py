@@ -0,0 +1,436 @@
+import random
+
+import move_tables
+from square import Square
+
+# The 32 playable squares are indexed 0-31, four per row, starting from white's base row (row 1).
+# Index i lies on row i // 4 (0-based); on even rows the playable columns are 1, 3, 5, 7 (0-based),
+# on odd rows they are 0, 2, 4, 6.
+FULL_MASK = 0xFFFFFFFF
+EVEN_ROWS = 0x0F0F0F0F
+ODD_ROWS = 0xF0F0F0F0
+LEFT_COLUMN = 0x10101010
+RIGHT_COLUMN = 0x08080808
+WHITE_PROMOTION_ROW = 0xF0000000
+BLACK_PROMOTION_ROW = 0x0000000F
+
+
+def down_left(mask):
+    return (((mask & EVEN_ROWS) << 4) | ((mask & ODD_ROWS & ~LEFT_COLUMN) << 3)) & FULL_MASK
+
+
+def down_right(mask):
+    return (((mask & EVEN_ROWS & ~RIGHT_COLUMN) << 5) | ((mask & ODD_ROWS) << 4)) & FULL_MASK
+
+
+def up_left(mask):
+    return ((mask & EVEN_ROWS) >> 4) | ((mask & ODD_ROWS & ~LEFT_COLUMN) >> 5)
+
+
+def up_right(mask):
+    return ((mask & EVEN_ROWS & ~RIGHT_COLUMN) >> 3) | ((mask & ODD_ROWS) >> 4)
+
+
+# Pairs of (shift, inverse shift). White men move down the board, black men move up, kings move both ways.
+WHITE_DIRECTIONS = ((down_left, up_right), (down_right, up_left))
+BLACK_DIRECTIONS = ((up_left, down_right), (up_right, down_left))
+
+
+def iterate_bits(mask):
+    """"
+    Yields the indices of the set bits of the given mask, lowest first
+    """
+    while mask:
+        bit = mask & -mask
+        yield bit.bit_length() - 1
+        mask ^= bit
+
+
+# Number of set bits of each 16-bit value, int.bit_count needs Python 3.10
+BIT_COUNTS = bytes(bin(value).count("1") for value in range(1 << 16))
+
+
+def count_bits(mask):
+    """
+    Returns the number of set bits of the given 32-bit mask
+    """
+    return BIT_COUNTS[mask & 0xFFFF] + BIT_COUNTS[mask >> 16]
+
+
+def compute_row_and_col(index):
+    """"
+    Returns row, col indices (between 0 and 7 inclusive) of the given playable square index
+    """
+    row = index // 4
+    col = 2 * (index % 4) + (1 if row % 2 == 0 else 0)
+    return row, col
+
+
+ROWS_AND_COLS = tuple(compute_row_and_col(index) for index in range(32))
+# Translation between playable square indices and the board's square numbers (1-64)
+SQUARE_NUMBERS = tuple(Square.compute_square_number(row + 1, col + 1) for row, col in ROWS_AND_COLS)
+INDICES = {square_number: index for index, square_number in enumerate(SQUARE_NUMBERS)}
+# (captured index, target index) pairs of the single captures from each square, e.g. PIECE_JUMPS[is_white][is_king]
+PIECE_JUMPS = tuple(tuple(tuple(tuple((INDICES[jumped], INDICES[landing])
+                                      for jumped, landing in move_tables.JUMPS[color][is_king][square_number])
+                                for square_number in SQUARE_NUMBERS)
+                          for is_king in (False, True))
+                    for color in ("black", "white"))
+
+# Zobrist keys, one per piece type and square, plus one that marks black as the side to move
+WHITE_MAN, WHITE_KING, BLACK_MAN, BLACK_KING = 0, 1, 2, 3
+_zobrist_random = random.Random(2023)
+ZOBRIST_KEYS = tuple(_zobrist_random.getrandbits(64) for _ in range(4 * 32))
+BLACK_TO_MOVE_KEY = _zobrist_random.getrandbits(64)
+
+# Material and zone counts of the evaluation, kept up to date by apply_move. They are packed in a single integer,
+# one byte per count: men and kings of each team, then each team's units in the middle rows (3-4) and in the
+# opponent's half (rows 5-7 for white, 0-2 for black).
+WHITE_MEN_COUNT, WHITE_KINGS_COUNT, BLACK_MEN_COUNT, BLACK_KINGS_COUNT = 0, 1, 2, 3
+WHITE_MIDDLE_COUNT, BLACK_MIDDLE_COUNT, WHITE_FAR_COUNT, BLACK_FAR_COUNT = 4, 5, 6, 7
+
+
+def get_square_counts(piece_type, index):
+    """"
+    Returns the packed counts of a single piece of the given type standing on the given square
+    """
+    row = index // 4
+    is_white = piece_type in (WHITE_MAN, WHITE_KING)
+    material_count = (WHITE_MEN_COUNT, WHITE_KINGS_COUNT, BLACK_MEN_COUNT, BLACK_KINGS_COUNT)[piece_type]
+    counts = 1 << 8 * material_count
+    if 3 <= row <= 4:
+        counts += 1 << 8 * (WHITE_MIDDLE_COUNT if is_white else BLACK_MIDDLE_COUNT)
+    if (is_white and row >= 5) or (not is_white and row <= 2):
+        counts += 1 << 8 * (WHITE_FAR_COUNT if is_white else BLACK_FAR_COUNT)
+    return counts
+
+
+# Indexed like ZOBRIST_KEYS, [32 * piece type + index]
+SQUARE_COUNTS = tuple(get_square_counts(piece_type, index) for piece_type in range(4) for index in range(32))
+
+
+def get_features(white, black, kings):
+    """"
+    Returns the occupancy features of the pieces on the board, 32 * piece type + index like the Zobrist keys
+    """
+    features = []
+    for piece_type, mask in ((WHITE_MAN, white & ~kings), (WHITE_KING, white & kings),
+                             (BLACK_MAN, black & ~kings), (BLACK_KING, black & kings)):
+        features.extend(32 * piece_type + index for index in iterate_bits(mask))
+    return features
+
+
+def compute_counts(white, black, kings):
+    return sum(SQUARE_COUNTS[feature] for feature in get_features(white, black, kings))
+
+
+def unpack_counts(counts):
+    """"
+    Returns the tuple of the counts, in the order of their byte positions
+    """
+    return (counts & 0xFF, counts >> 8 & 0xFF, counts >> 16 & 0xFF, counts >> 24 & 0xFF, counts >> 32 & 0xFF,
+            counts >> 40 & 0xFF, counts >> 48 & 0xFF, counts >> 56)
+
+
+# Deepest line the search plays, a multiple capture counts as a single move
+UNDO_STACK_SIZE = 32
+
+
+class Move:
+    """
+    A complete move: the squares the piece goes through, from its source to its target, and the mask of the
+    pieces it captures (0 for a non-capturing move).
+    """
+    __slots__ = ("path", "source", "target", "captured")
+
+    def __init__(self, path, captured=0):
+        self.path = path
+        self.source = path[0]
+        self.target = path[-1]
+        self.captured = captured
+
+    def __eq__(self, other):
+        return isinstance(other, Move) and self.path == other.path and self.captured == other.captured
+
+    def __hash__(self):
+        return hash((self.path, self.captured))
+
+    def __repr__(self):
+        separator = 'x' if self.captured else '-'
+        return f"Move({separator.join(str(SQUARE_NUMBERS[index]) for index in self.path)})"
+
+
+class UndoRecord:
+    __slots__ = ("move", "is_white", "captured_kings", "promoted", "hash", "counts", "accumulator")
+
+    def __init__(self):
+        self.hash = 0
+        self.counts = 0
+        self.accumulator = None
+        self.move = None
+        self.is_white = False
+        self.captured_kings = 0
+        self.promoted = False
+
+
+class BitBoard:
+    """
+    Compact position used by the agent's search.
+
+    The position is stored as three 32-bit masks over the playable squares: white pieces, black pieces and
+    kings of both colors.
+    """
+
+    def __init__(self, white, black, kings):
+        self.white = white
+        self.black = black
+        self.kings = kings
+        self.hash = self.compute_hash()
+        self.counts = compute_counts(white, black, kings)
+
+        # Weights (one row per occupancy feature) of an occupancy network's first layer, and that layer's outputs
+        # on the position, which apply_move keeps up to date once set_feature_weights is called
+        self.feature_weights = None
+        self.accumulator = None
+
+        # Undo records of the moves played with apply_move, preallocated up to the search depth
+        self.undo_stack = [UndoRecord() for _ in range(UNDO_STACK_SIZE)]
+        self.ply = 0
+
+    @classmethod
+    def from_board(cls, board):
+        white, black, kings = 0, 0, 0
+        for pawn in board.white_team:
+            white |= 1 << INDICES[pawn.square_number]
+            if pawn.queen:
+                kings |= 1 << INDICES[pawn.square_number]
+        for pawn in board.black_team:
+            black |= 1 << INDICES[pawn.square_number]
+            if pawn.queen:
+                kings |= 1 << INDICES[pawn.square_number]
+        return cls(white, black, kings)
+
+    def compute_hash(self):
+        """
+        Returns the Zobrist hash of the pieces on the board, apply_move keeps it up to date afterwards
+        """
+        position_hash = 0
+        for feature in get_features(self.white, self.black, self.kings):
+            position_hash ^= ZOBRIST_KEYS[feature]
+        return position_hash
+
+    def set_feature_weights(self, feature_weights, bias):
+        """
+        Computes the accumulator, the first layer's outputs bias + sum of the rows of the position's features. Each
+        move then only adds and subtracts the rows of the pieces it moves and captures.
+        """
+        self.feature_weights = feature_weights
+        self.accumulator = bias + feature_weights[get_features(self.white, self.black, self.kings)].sum(axis=0)
+
+    def get_key(self, is_white_turn):
+        """
+        Returns the transposition table key of the position with the given side to move
+        """
+        return self.hash if is_white_turn else self.hash ^ BLACK_TO_MOVE_KEY
+
+    def get_pieces(self, is_white):
+        """
+        Returns the masks of the given team's pieces and of the opponent's pieces
+        """
+        if is_white:
+            return self.white, self.black
+        return self.black, self.white
+
+    def get_empty(self):
+        return ~(self.white | self.black) & FULL_MASK
+
+    def get_legal_moves(self, is_white):
+        """
+        Returns a list of the team's legal moves, its captures if it has any (captures are mandatory) and
+        otherwise its non-capturing moves. An empty list means the team has lost.
+        """
+        return self.get_captures(is_white) or self.get_moves(is_white)
+
+    def get_moves(self, is_white):
+        """
+        Returns a list of the team's non-capturing moves
+        """
+        own, _ = self.get_pieces(is_white)
+        return self.generate_moves(own, own & self.kings, is_white)
+
+    def generate_moves(self, pieces, kings, is_white):
+        forward_directions, backward_directions = self.get_directions(is_white)
+        empty = self.get_empty()
+        moves = []
+
+        for directions, movers in ((forward_directions, pieces), (backward_directions, kings)):
+            for shift, inverse_shift in directions:
+                for target in iterate_bits(shift(movers) & empty):
+                    source = inverse_shift(1 << target).bit_length() - 1
+                    moves.append(Move((source, target)))
+
+        return moves
+
+    def get_captures(self, is_white):
+        """
+        Returns a list of the team's complete capture moves
+        """
+        forward_directions, backward_directions = self.get_directions(is_white)
+        own, opponent = self.get_pieces(is_white)
+        empty = self.get_empty()
+
+        # The pieces that can start a capture are found for all of them at once
+        capturing_pieces = 0
+        for directions, jumpers in ((forward_directions, own), (backward_directions, own & self.kings)):
+            for shift, inverse_shift in directions:
+                capturing_pieces |= inverse_shift(inverse_shift(shift(shift(jumpers) & opponent) & empty))
+
+        captures = []
+        for index in iterate_bits(capturing_pieces):
+            captures.extend(self.get_piece_captures(index, is_white))
+        return captures
+
+    def get_piece_captures(self, index, is_white):
+        """
+        Returns a list of the complete capture moves of the piece standing on the given square, a multiple capture
+        being a single move
+        """
+        _, opponent = self.get_pieces(is_white)
+        is_king = self.kings >> index & 1
+        # Men stop capturing when they are promoted
+        promotion_row = 0 if is_king else (WHITE_PROMOTION_ROW if is_white else BLACK_PROMOTION_ROW)
+        # The capturing piece leaves its square
+        occupied = (self.white | self.black) & ~(1 << index)
+
+        captures = []
+        self.add_capture_sequences(captures, (index,), 0, occupied, opponent, PIECE_JUMPS[is_white][is_king],
+                                   promotion_row)
+        return captures
+
+    @staticmethod
+    def add_capture_sequences(captures, path, captured, occupied, opponent, jumps, promotion_row):
+        """
+        Adds to captures every capture sequence that extends the given path until no capture is left
+        """
+        is_extended = False
+        for jumped, target in jumps[path[-1]]:
+            jumped_bit = 1 << jumped
+            if opponent & jumped_bit and not occupied >> target & 1:
+                is_extended = True
+                next_path = path + (target,)
+                if promotion_row >> target & 1:
+                    captures.append(Move(next_path, captured | jumped_bit))
+                else:
+                    # Captured pieces are removed at once, so they can't be jumped twice
+                    BitBoard.add_capture_sequences(captures, next_path, captured | jumped_bit, occupied & ~jumped_bit,
+                                                   opponent & ~jumped_bit, jumps, promotion_row)
+
+        if not is_extended and len(path) > 1:
+            captures.append(Move(path, captured))
+
+    @staticmethod
+    def get_directions(is_white):
+        """
+        Returns the team's forward directions and the directions only kings can use
+        """
+        if is_white:
+            return WHITE_DIRECTIONS, BLACK_DIRECTIONS
+        return BLACK_DIRECTIONS, WHITE_DIRECTIONS
+
+    def apply_move(self, move, is_white):
+        """
+        Plays the given move in place and records what is needed to undo it.
+
+        Returns whether the move promoted a man.
+        """
+        # A king's multiple capture may end on its source square, in which case the bits cancel out
+        source_bit, target_bit = 1 << move.source, 1 << move.target
+        record = self.push_undo_record()
+        record.move = move
+        record.is_white = is_white
+        record.hash = self.hash
+        record.counts = self.counts
+        man_type = WHITE_MAN if is_white else BLACK_MAN
+
+        if is_white:
+            self.white ^= source_bit ^ target_bit
+        else:
+            self.black ^= source_bit ^ target_bit
+
+        captured = move.captured
+        record.captured_kings = captured & self.kings
+        if captured:
+            opponent_man_type = BLACK_MAN if is_white else WHITE_MAN
+            for index in iterate_bits(captured):
+                captured_type = opponent_man_type + (record.captured_kings >> index & 1)
+                self.hash ^= ZOBRIST_KEYS[32 * captured_type + index]
+                self.counts -= SQUARE_COUNTS[32 * captured_type + index]
+            self.white &= ~captured
+            self.black &= ~captured
+            self.kings &= ~captured
+
+        record.promoted = False
+        source_type = target_type = man_type
+        if self.kings & source_bit:
+            self.kings ^= source_bit ^ target_bit
+            source_type = target_type = man_type + 1
+        elif target_bit & (WHITE_PROMOTION_ROW if is_white else BLACK_PROMOTION_ROW):
+            self.kings |= target_bit
+            target_type = man_type + 1
+            record.promoted = True
+        self.hash ^= ZOBRIST_KEYS[32 * source_type + move.source] ^ ZOBRIST_KEYS[32 * target_type + move.target]
+        self.counts += SQUARE_COUNTS[32 * target_type + move.target] - SQUARE_COUNTS[32 * source_type + move.source]
+
+        feature_weights = self.feature_weights
+        if feature_weights is not None:
+            # The accumulators aren't modified in place, the undo record keeps the previous one
+            record.accumulator = self.accumulator
+            accumulator = self.accumulator + (feature_weights[32 * target_type + move.target] -
+                                              feature_weights[32 * source_type + move.source])
+            if captured:
+                for index in iterate_bits(captured):
+                    captured_type = opponent_man_type + (record.captured_kings >> index & 1)
+                    accumulator = accumulator - feature_weights[32 * captured_type + index]
+            self.accumulator = accumulator
+
+        return record.promoted
+
+    def undo_move(self):
+        """
+        Takes back the last move played with apply_move
+        """
+        self.ply -= 1
+        record = self.undo_stack[self.ply]
+        move = record.move
+        self.hash = record.hash
+        self.counts = record.counts
+        self.accumulator = record.accumulator
+        source_bit, target_bit = 1 << move.source, 1 << move.target
+
+        if record.is_white:
+            self.white ^= source_bit ^ target_bit
+            self.black |= move.captured
+        else:
+            self.black ^= source_bit ^ target_bit
+            self.white |= move.captured
+
+        if record.promoted:
+            self.kings &= ~target_bit
+        elif self.kings & target_bit:
+            self.kings ^= source_bit ^ target_bit
+        self.kings |= record.captured_kings
+
+    def push_undo_record(self):
+        # Records are reused between moves, so walking the search tree doesn't allocate them
+        if self.ply == len(self.undo_stack):
+            self.undo_stack.append(UndoRecord())
+        record = self.undo_stack[self.ply]
+        self.ply += 1
+        return record
+
+    def copy(self):
+        position = BitBoard(self.white, self.black, self.kings)
+        if self.feature_weights is not None:
+            position.feature_weights = self.feature_weights
+            position.accumulator = self.accumulator
+        return position
@@ -0,0 +1,181 @@
+import numpy as np
+
+from bitboard import FULL_MASK, RIGHT_COLUMN, down_left, down_right, up_left, up_right, compute_row_and_col, \
+    compute_counts, unpack_counts, count_bits
+
+# Computes board_evaluator.get_metrics on the masks of a BitBoard, with the same results. Each side's view is
+# computed once, in its own orientation: its pieces move down the board (towards higher indices), as white does.
+# The other side's view is the reversed board, where index i becomes 31 - i and the colors are swapped.
+
+
+def get_row_mask(first_row, last_row):
+    return sum(0xF << 4 * row for row in range(first_row, last_row + 1))
+
+
+# Squares that aren't on the first or last row or column, they have four diagonal neighbors
+INNER_SQUARES = sum(1 << index for index in range(32) if all(1 <= x <= 6 for x in compute_row_and_col(index)))
+EDGE_SQUARES = FULL_MASK & ~INNER_SQUARES
+ROW_1 = get_row_mask(1, 1)
+
+REVERSED_BYTES = tuple(int(f"{byte:08b}"[::-1], 2) for byte in range(256))
+
+
+def reverse_mask(mask):
+    return (REVERSED_BYTES[mask & 0xFF] << 24 | REVERSED_BYTES[mask >> 8 & 0xFF] << 16 |
+            REVERSED_BYTES[mask >> 16 & 0xFF] << 8 | REVERSED_BYTES[mask >> 24])
+
+
+def reverse(white, black, kings):
+    """
+    Returns the masks of the reversed board (board_evaluator.reverse), where black plays white's part
+    """
+    return reverse_mask(black), reverse_mask(white), reverse_mask(kings)
+
+
+def get_index(row, col):
+    return 4 * row + col // 2
+
+
+def build_jumps(row_direction, first_row, last_row, is_wrapped=False):
+    """
+    Returns the (jumped index, landing index) pairs of the jumps of each square in the given row direction, for
+    the squares of rows first_row to last_row. Rows are taken modulo 8, like numpy's negative indices.
+    """
+    jumps = []
+    for index in range(32):
+        row, col = compute_row_and_col(index)
+        # A wrapped king stands on row 7 but jumps as if it was on row -1
+        logical_row = row - 8 if is_wrapped else row
+        square_jumps = []
+        if first_row <= row <= last_row:
+            for col_direction in (1, -1):
+                if 0 <= col + 2 * col_direction <= 7:
+                    jumped = get_index((logical_row + row_direction) % 8, col + col_direction)
+                    landing = get_index((logical_row + 2 * row_direction) % 8, col + 2 * col_direction)
+                    square_jumps.append((jumped, landing))
+        jumps.append(tuple(square_jumps))
+    return tuple(jumps)
+
+
+# num_branches' jumps: men and kings jump forward from rows 0-5, kings jump backward from rows 2-7.
+# A king's backward jump from row 1 lands on row 7 through numpy's negative indexing. The king then stands on a
+# "wrapped" row -1, from which it only jumps forward, over row 0 to row 1.
+FORWARD_JUMPS = build_jumps(1, 0, 5)
+BACKWARD_JUMPS = build_jumps(-1, 2, 7)
+WRAPPING_BACKWARD_JUMPS = build_jumps(-1, 1, 1)
+WRAPPED_FORWARD_JUMPS = build_jumps(1, 7, 7, is_wrapped=True)
+
+
+def count_branches(index, is_wrapped, is_king, opponent, empty):
+    """
+    Returns num_branches of the piece standing on the given square: the number of jumps of all its capture
+    sequences, the captured pieces being removed as it goes
+    """
+    count = 0
+    # The piece leaves its square when it jumps
+    empty |= 1 << index
+    for jumped, landing in (WRAPPED_FORWARD_JUMPS if is_wrapped else FORWARD_JUMPS)[index]:
+        if opponent >> jumped & 1 and empty >> landing & 1:
+            count += count_branches(landing, False, is_king, opponent & ~(1 << jumped),
+                                    (empty | 1 << jumped) & ~(1 << landing)) + 1
+    if is_king and not is_wrapped:
+        for jumps, lands_wrapped in ((BACKWARD_JUMPS, False), (WRAPPING_BACKWARD_JUMPS, True)):
+            for jumped, landing in jumps[index]:
+                if opponent >> jumped & 1 and empty >> landing & 1:
+                    count += count_branches(landing, lands_wrapped, is_king, opponent & ~(1 << jumped),
+                                            (empty | 1 << jumped) & ~(1 << landing)) + 1
+    return count
+
+
+def possible_moves(own, opponent, kings):
+    """
+    Returns board_evaluator.possible_moves of the side whose pieces are own
+    """
+    empty = FULL_MASK & ~(own | opponent)
+    own_kings = own & kings
+
+    # Only the pieces that have a first jump are walked, the kings of row 1 may have a wrapping one
+    jumpers = own & (up_right(up_right(empty) & opponent) | up_left(up_left(empty) & opponent))
+    jumpers |= own_kings & (down_left(down_left(empty) & opponent) | down_right(down_right(empty) & opponent) | ROW_1)
+    count = 0
+    mask = jumpers
+    while mask:
+        bit = mask & -mask
+        count += count_branches(bit.bit_length() - 1, False, bool(own_kings & bit), opponent, empty)
+        mask ^= bit
+    if count > 0:
+        return count
+
+    count = count_bits(down_left(own) & empty) + count_bits(down_right(own) & empty)
+    # Backwards, a king that isn't on the last column only counts its move to the right
+    count += count_bits(up_right(own_kings & ~RIGHT_COLUMN) & empty)
+    count += count_bits(up_left(own_kings & RIGHT_COLUMN) & empty)
+    return count
+
+
+def capturables(opponent):
+    """
+    Returns the number of inner opponent pieces without an opponent piece on any of their diagonals
+    """
+    supported = up_left(opponent) | up_right(opponent) | down_left(opponent) | down_right(opponent)
+    return count_bits(opponent & INNER_SQUARES & ~supported)
+
+
+def uncapturables(own):
+    """
+    Returns the number of own pieces on the edges or with own pieces on two adjacent diagonals
+    """
+    # Squares whose down right (down left, up right, up left) neighbor is an own piece
+    down_right_support, down_left_support = up_left(own), up_right(own)
+    up_right_support, up_left_support = down_left(own), down_right(own)
+    supported = ((down_right_support & down_left_support) | (up_right_support & up_left_support) |
+                 (down_right_support & up_right_support) | (down_left_support & up_left_support))
+    return count_bits(own & INNER_SQUARES & supported) + count_bits(own & EDGE_SQUARES)
+
+
+def get_view_terms(own, opponent, kings):
+    """
+    Returns the terms of a side's view that depend on the pieces' neighbors: possible moves, capturables and
+    uncapturables
+    """
+    return possible_moves(own, opponent, kings), capturables(opponent), uncapturables(own)
+
+
+def get_metrics(white, black, kings, counts=None):
+    """
+    Returns board_evaluator.get_metrics of the board with the given white, black and kings masks.
+
+    counts are the board's packed material and zone counts (BitBoard.counts), computed from the masks if not given.
+    """
+    if counts is None:
+        counts = compute_counts(white, black, kings)
+    white_men, white_kings, black_men, black_kings, white_mid, black_mid, white_far, black_far = unpack_counts(counts)
+
+    reversed_white, reversed_black, reversed_kings = reverse(white, black, kings)
+    own_moves, own_caps, own_uncaps = get_view_terms(white, black, kings)
+    opponent_moves, opponent_caps, opponent_uncaps = get_view_terms(reversed_white, reversed_black, reversed_kings)
+
+    capped = 12 - black_men - black_kings
+    potential = own_moves - opponent_moves
+    men = white_men - black_men
+    kings_count = white_kings - black_kings
+    caps = own_caps - opponent_caps
+    semicaps = 12 - own_uncaps - opponent_caps
+    uncaps = own_uncaps - opponent_uncaps
+    mid = white_mid - black_mid
+    far = white_far - black_far
+    if not black:
+        won = 1
+    elif not white:
+        won = -1
+    elif own_moves == 0:
+        won = -1
+    elif opponent_moves == 0:
+        won = 1
+    else:
+        won = 0
+
+    score = (4 * capped + potential + men + 3 * kings_count + caps + 2 * semicaps + 3 * uncaps + 2 * mid + 3 * far +
+             100 * won)
+
+    return np.array([score, capped, potential, men, kings_count, caps, semicaps, uncaps, mid, far, won])
@@ -121,9 +121,6 @@ class Board:
         else:
             self.white_team.add(pawn)
 
-    def is_square_valid_and_free(self, square_number):
-        return Square.is_valid_square_number(square_number) and self.squares[square_number].free
-
     def promote_pawn(self, pawn, ui):
         copy = pawn.copy()
         self.delete_pawn(pawn, ui)
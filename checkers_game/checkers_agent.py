@@ -1,28 +1,154 @@
 import os
-import joblib
+import sys
 import warnings
 import numpy as np
-import torch
+
+# Largest difference allowed between the folded model's predictions and the original ones
+VERIFICATION_TOLERANCE = 1e-4
+# The men and kings differences range from -12 to 12, the material estimate's tables start at -12
+MATERIAL_OFFSET = 12
+
+# The model evaluating the boards: the network on the 11 board metrics, or the occupancy network trained by
+# agent_creation/train_nnue.py, whose first layer is kept up to date by the positions as moves are played
+METRICS_EVALUATOR = "metrics"
+NNUE_EVALUATOR = "nnue"
 
 
 class CheckersAgent:
-    def __init__(self):
-        self.model = self.load_model("agent_model.pth")
-        self.scaler = self.load_scaler("scaler.pkl")
+    def __init__(self, use_torch=False, evaluator=METRICS_EVALUATOR, quantized=False):
+        self.evaluator = evaluator
+        self.quantized = False
+        if evaluator == NNUE_EVALUATOR:
+            # The occupancy network only runs with NumPy, and has no material estimate
+            self.use_torch = False
+            self.layers = self.load_model("nnue_model.npz")
+            self.material_estimates, self.material_margins = self.get_uncalibrated_material_estimate()
+            return
+
+        # The NumPy model computes the same outputs as the torch one, torch is only needed to train and export it
+        self.use_torch = use_torch and not quantized
+        self.quantized = quantized
+        if quantized:
+            # The int8 model is exported with the scaler already folded in, by agent_creation/quantize_model.py
+            self.layers = self.load_quantized_model("agent_model_int8.npz")
+        elif use_torch:
+            self.model = self.load_torch_model("agent_model.pth")
+        else:
+            self.layers = self.load_model("agent_model.npz")
+        if not quantized:
+            # Inference then runs on the raw board metrics, without calling the scaler
+            self.fold_scaler(*self.load_scaler_parameters("agent_model.npz"))
+        # Cheap estimate of the model's prediction from the material alone, fitted by
+        # agent_creation/calibrate_lazy_eval.py, and the largest error expected from it
+        self.material_estimates, self.material_margins = self.load_material_estimate("material_estimate.npz")
 
     @staticmethod
     def load_model(model_filename):
+        """
+        Loads the (weight, bias) pairs of the model's linear layers exported by agent_creation/export_model.py.
+
+        The weights are stored transposed, so that a layer is applied to a batch of inputs as inputs @ weight + bias.
+        """
+        full_path = CheckersAgent.get_file_path(model_filename)
+        with np.load(full_path) as arrays:
+            num_layers = sum(name.startswith("weight_") for name in arrays.files)
+            return [(np.ascontiguousarray(arrays[f"weight_{i}"].T), arrays[f"bias_{i}"]) for i in range(num_layers)]
+
+    @staticmethod
+    def load_quantized_model(model_filename):
+        """
+        Loads the (weight, bias, inverse input scales, weight scales) tuples of the int8 model's linear layers.
+
+        A layer's inputs are quantized by its input scales, one per input, and its integer sums are scaled back by
+        the weight scales, one per output.
+
+        NumPy has no int8 matrix product, and its integer ones don't use BLAS. The int8 weights are widened to
+        float32 instead: the sums of products of int8 values (and of the small integer metrics) stay far below
+        2 ** 24, so float32 computes them exactly, the same as int32 accumulation would.
+        """
+        full_path = CheckersAgent.get_file_path(model_filename)
+        with np.load(full_path) as arrays:
+            num_layers = len(arrays.files) // 4
+            layers = []
+            for i in range(num_layers):
+                weight = np.ascontiguousarray(arrays[f"weight_{i}"].T, dtype=np.float32)
+                inverse_input_scales = (1 / arrays[f"input_scales_{i}"]).astype(np.float32)
+                layers.append((weight, arrays[f"bias_{i}"], inverse_input_scales,
+                               arrays[f"weight_scales_{i}"].astype(np.float32)))
+            return layers
+
+    @staticmethod
+    def load_torch_model(model_filename):
+        # Importing torch takes a while, so it's only done when the torch model is used
+        import torch
+
         full_path = CheckersAgent.get_file_path(model_filename)
-        model = torch.load(full_path)
+        model = torch.load(full_path, weights_only=False)
         return model
 
+    @staticmethod
+    def load_scaler_parameters(model_filename):
+        """
+        Returns the mean and scale of the scaler, exported with the model's weights by agent_creation/export_model.py
+        """
+        full_path = CheckersAgent.get_file_path(model_filename)
+        with np.load(full_path) as arrays:
+            return arrays["scaler_mean"][()], arrays["scaler_scale"][()]
+
     @staticmethod
     def load_scaler(scaler_filename):
+        # The pickled scaler needs scikit-learn, it's only loaded to verify the folded model
+        import joblib
+
         full_path = CheckersAgent.get_file_path(scaler_filename)
         with open(full_path, 'rb') as file:
             scaler = joblib.load(file)
         return scaler
 
+    @staticmethod
+    def load_material_estimate(estimate_filename):
+        """
+        Returns the material estimates and their error margins, as nested lists indexed by the men and kings
+        differences (shifted by MATERIAL_OFFSET).
+
+        Without a calibrated estimate the margins are infinite, so the model evaluates every board.
+        """
+        full_path = CheckersAgent.get_file_path(estimate_filename)
+        if not os.path.exists(full_path):
+            return CheckersAgent.get_uncalibrated_material_estimate()
+        with np.load(full_path) as arrays:
+            return arrays["estimates"].tolist(), arrays["margins"].tolist()
+
+    @staticmethod
+    def get_uncalibrated_material_estimate():
+        size = 2 * MATERIAL_OFFSET + 1
+        return [[0.0] * size for _ in range(size)], [[float('inf')] * size for _ in range(size)]
+
+    def get_first_layer(self):
+        """
+        Returns the occupancy network's first layer, its weights (one row per occupancy feature) and bias
+        """
+        return self.layers[0]
+
+    def fold_scaler(self, mean, scale):
+        """
+        Folds the scaler, which standardizes the first feature only, into the first linear layer.
+
+        w0 * (x0 - mean) / scale + b = (w0 / scale) * x0 + (b - w0 * mean / scale)
+        """
+        if self.use_torch:
+            import torch
+
+            first_layer = self.model[0]
+            with torch.no_grad():
+                first_layer.bias -= first_layer.weight[:, 0] * mean / scale
+                first_layer.weight[:, 0] /= scale
+        else:
+            # The weights are stored transposed, the first feature's weights are the first row
+            weight, bias = self.layers[0]
+            bias -= (weight[0] * mean / scale).astype(np.float32)
+            weight[0] = weight[0] / scale
+
     @staticmethod
     def get_file_path(filename):
         """
@@ -33,20 +159,106 @@ class CheckersAgent:
         return full_path
 
     def predict(self, board_eval):
-        board_eval = self.scale_first_feature_value(board_eval)
-        board_eval = torch.tensor(board_eval, dtype=torch.float32)
-        with torch.no_grad():
-            prediction = self.model(board_eval)
-        # Convert the prediction tensor to a numerical value
+        prediction = self.forward(np.asarray(board_eval).reshape(1, -1))
+        # Convert the (1, 1) prediction array to a numerical value
         predicted_value = prediction.item()
         return predicted_value
 
-    def scale_first_feature_value(self, board_eval):
-        board_eval = list(board_eval)
+    def predict_batch(self, board_evals):
+        """
+        Predicts the values of several boards with a single forward pass.
+
+        board_evals is an (N, 11) array of board metrics, or N accumulators for the occupancy network. Returns a list
+        of N values.
+        """
+        predictions = self.forward(np.asarray(board_evals))
+        return predictions.flatten().tolist()
+
+    def estimate_material(self, men, kings):
+        """
+        Returns the material estimate of the model's prediction from the men and kings metrics, and its margin. The
+        prediction is within the margin of the estimate for all but a small fraction of the boards.
+        """
+        men += MATERIAL_OFFSET
+        kings += MATERIAL_OFFSET
+        return self.material_estimates[men][kings], self.material_margins[men][kings]
+
+    def forward(self, inputs):
+        """
+        Runs the model on an (N, 11) array of board metrics, returns an (N, 1) array of predictions.
+
+        The occupancy network's inputs are the positions' accumulators, the outputs of its first layer.
+        """
+        if self.evaluator == NNUE_EVALUATOR:
+            return self.forward_numpy(self.layers[1:], np.maximum(inputs, 0))
+        if self.quantized:
+            return self.forward_quantized(self.layers, inputs)
+        if self.use_torch:
+            return self.forward_torch(self.model, inputs)
+        return self.forward_numpy(self.layers, inputs)
+
+    @staticmethod
+    def forward_numpy(layers, inputs):
+        outputs = inputs.astype(np.float32)
+        last_layer = len(layers) - 1
+        for i, (weight, bias) in enumerate(layers):
+            outputs = outputs @ weight + bias
+            # ReLU between the linear layers
+            if i < last_layer:
+                np.maximum(outputs, 0, out=outputs)
+        return outputs
+
+    @staticmethod
+    def forward_quantized(layers, inputs):
+        """
+        Runs the int8 model: the first layer takes the integer board metrics as they are, the hidden layers'
+        activations are quantized to int8 with their calibrated scales
+        """
+        outputs = inputs.astype(np.float32)
+        last_layer = len(layers) - 1
+        for i, (weight, bias, inverse_input_scales, weight_scales) in enumerate(layers):
+            if i > 0:
+                # The activations are positive after the ReLU
+                outputs = np.minimum(np.rint(outputs * inverse_input_scales), 127)
+            outputs = (outputs @ weight) * weight_scales + bias
+            if i < last_layer:
+                np.maximum(outputs, 0, out=outputs)
+        return outputs
+
+    @staticmethod
+    def forward_torch(model, inputs):
+        import torch
+
+        inputs = torch.tensor(inputs, dtype=torch.float32)
+        with torch.no_grad():
+            outputs = model(inputs)
+        return outputs.numpy()
+
+    def verify_scaler_folding(self, board_evals):
+        """
+        Returns the largest difference between the agent's predictions and the predictions of the original model,
+        which scales the first feature with the scaler before the first layer
+        """
+        board_evals = np.array(board_evals, dtype=float)
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
-            new_feature_value = self.scaler.transform(board_eval[0].reshape(-1, 1))[0][0]
-            board_eval[0] = new_feature_value
-            board_eval = np.array(board_eval).reshape(1, -1)
+            scaler = self.load_scaler("scaler.pkl")
+            scaled_board_evals = board_evals.copy()
+            scaled_board_evals[:, 0] = scaler.transform(board_evals[:, :1])[:, 0]
+
+        if self.use_torch:
+            expected = self.forward_torch(self.load_torch_model("agent_model.pth"), scaled_board_evals)
+        else:
+            expected = self.forward_numpy(self.load_model("agent_model.npz"), scaled_board_evals)
+        predictions = self.forward(board_evals)
+        return float(np.max(np.abs(predictions - expected)))
+
 
-        return board_eval
+if __name__ == "__main__":
+    # Verification mode: python checkers_agent.py <board_evals.csv> [--torch]
+    # The dataset's rows are the 11 board metrics followed by the game's outcome, as written by data_manipulation
+    dataset = np.loadtxt(sys.argv[1], delimiter=',', ndmin=2)[:, :11]
+    agent = CheckersAgent(use_torch="--torch" in sys.argv[2:])
+    max_difference = agent.verify_scaler_folding(dataset)
+    status = "OK" if max_difference <= VERIFICATION_TOLERANCE else "FAILED"
+    print(f"{status}: max difference {max_difference:.2e} over {len(dataset)} boards")
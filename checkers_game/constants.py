@@ -1,6 +1,12 @@
+import pygame
+
 BOARD_SIDE_LENGTH = 600
 WHITE = (255, 255, 255)
 SELECT_COLOR = (255, 255, 255)
 BUTTON_TEXT_COLOR = (220, 200, 0)
 HIGHLIGHT_COLOR = (255, 215, 0)
 TEXT_COLOR = (40, 9, 3)
+# Posted by the agent's background search when its move is ready
+AGENT_MOVE_EVENT = pygame.USEREVENT + 1
+# Frame rate of the window while the agent is searching
+AGENT_TURN_FPS = 30
@@ -0,0 +1,54 @@
+import random
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 1 << 16
+
+# Mixed into the key of a position evaluated from the other side's point of view
+REVERSED_KEY = random.Random(2024).getrandbits(64)
+
+
+class EvaluationCache:
+    """
+    Bounded cache of the agent's predictions, keyed by the Zobrist hash of the pieces (BitBoard.hash).
+
+    When the cache is full, the least recently used entry is evicted. The cache is shared by the background search
+    and offer_draw, which runs in the game's thread, so its accesses are guarded by a lock.
+    """
+
+    def __init__(self, size=DEFAULT_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Statistics of the lookups, updated outside the lock: a lookup of the other thread may rarely be lost
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(position, reverse=False):
+        return position.hash ^ REVERSED_KEY if reverse else position.hash
+
+    def get(self, key):
+        """
+        Returns the cached score of the given key, or None on a miss
+        """
+        with self.lock:
+            score = self.entries.get(key)
+            if score is not None:
+                self.entries.move_to_end(key)
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return score
+
+    def put(self, key, score):
+        with self.lock:
+            self.entries[key] = score
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def get_hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
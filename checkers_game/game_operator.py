@@ -57,6 +57,8 @@ class GameOperator:
             self.agent_move_handler.set_difficulty(new_difficulty)
 
     def handle_end_of_game(self, outcome):
+        # The agent's move is no longer needed, whether the game ends during its turn or not
+        self.agent_move_handler.cancel_search()
         second_pressed_button = self.ui.display_end_of_game(outcome)
         if second_pressed_button == "REMATCH":
             self.board.reset()
@@ -108,10 +110,43 @@ class GameOperator:
                 pygame.time.delay(500)
                 self.handle_end_of_game(outcome="won")
             else:
-                self.agent_move_handler.play(self.board, self.ui)
+                self.play_agent_turn()
                 self.move_handler.is_player_turn = True
 
-    @staticmethod
-    def quit_game():
+    def play_agent_turn(self):
+        """
+        Lets the agent search for its move in the background, while the window keeps drawing and handling events
+        """
+        clock = pygame.time.Clock()
+        search_id = self.agent_move_handler.start_search(self.board)
+
+        while True:
+            # Event handler
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.quit_game()
+                elif event.type == constants.AGENT_MOVE_EVENT:
+                    # Ignore the move of a search that was cancelled
+                    if event.search_id == search_id:
+                        # The search's error is raised here, its thread can't end the game
+                        if event.error is not None:
+                            self.agent_move_handler.close()
+                            raise event.error
+                        self.agent_move_handler.play_move(self.board, event.move, self.ui)
+                        return
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    pressed_button = self.ui.button_handler.get_pressed_button(event.pos)
+                    if pressed_button:
+                        self.handle_button_press(pressed_button)
+                        # The game ended and a rematch started
+                        if self.move_handler.is_player_turn:
+                            return
+
+            self.ui.draw()
+            pygame.display.flip()
+            clock.tick(constants.AGENT_TURN_FPS)
+
+    def quit_game(self):
+        self.agent_move_handler.close()
         pygame.quit()
         sys.exit()
@@ -2,6 +2,8 @@ import pygame
 from game_operator import GameOperator
 
 
-pygame.init()
-game_operator = GameOperator()
-game_operator.run()
+if __name__ == "__main__":
+    # The agent's worker processes import this module, they mustn't start a game of their own
+    pygame.init()
+    game_operator = GameOperator()
+    game_operator.run()
@@ -0,0 +1,85 @@
+from bitboard import WHITE_PROMOTION_ROW, BLACK_PROMOTION_ROW, count_bits
+
+# Ordering scores, from the first moves to search to the last ones
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KING_CAPTURE_BONUS = 1 << 22
+CAPTURED_PIECE_BONUS = 1 << 18
+PROMOTION_SCORE = 1 << 26
+KILLER_MOVE_SCORES = (1 << 25, 1 << 24)
+# History scores are halved when one of them exceeds this value, so they stay below the killer move scores
+MAX_HISTORY_SCORE = 1 << 20
+NUM_KILLER_MOVES = len(KILLER_MOVE_SCORES)
+
+
+class MoveOrderer:
+    """
+    Orders the moves of a search node so that alpha-beta finds its cutoffs early.
+
+    The stored best move of the position comes first, then captures (those taking the most kings, then the most
+    pieces first), promotions, the killer moves of the node's ply and the rest by their history score. Men moves
+    that end closer to the king row come first among moves with equal scores.
+    """
+
+    def __init__(self, max_ply=64):
+        # Quiet moves that caused a cutoff at each ply
+        self.killer_moves = [[None] * NUM_KILLER_MOVES for _ in range(max_ply)]
+        # Cutoff counts weighted by the searched depth, indexed by team, source square and target square
+        self.history = [0] * (2 * 32 * 32)
+
+    def new_search(self):
+        for killer_moves in self.killer_moves:
+            for i in range(NUM_KILLER_MOVES):
+                killer_moves[i] = None
+        self.age_history()
+
+    def age_history(self):
+        for i in range(len(self.history)):
+            self.history[i] >>= 1
+
+    def order(self, moves, hash_move, ply, position, is_white):
+        killer_moves = self.killer_moves[ply] if ply < len(self.killer_moves) else ()
+        history_offset = 1024 if is_white else 0
+        promotion_row = WHITE_PROMOTION_ROW if is_white else BLACK_PROMOTION_ROW
+        kings = position.kings
+
+        def get_score(move):
+            if move == hash_move:
+                return HASH_MOVE_SCORE
+
+            score = 0
+            if move.captured:
+                score += (CAPTURE_SCORE + KING_CAPTURE_BONUS * count_bits(kings & move.captured) +
+                          CAPTURED_PIECE_BONUS * count_bits(move.captured))
+            elif move in killer_moves:
+                score += KILLER_MOVE_SCORES[killer_moves.index(move)]
+            else:
+                score += self.history[history_offset + 32 * move.source + move.target]
+
+            if not kings >> move.source & 1:
+                if promotion_row >> move.target & 1:
+                    score += PROMOTION_SCORE
+                # Rows advanced towards the king row
+                score += move.target // 4 if is_white else 7 - move.target // 4
+            return score
+
+        moves.sort(key=get_score, reverse=True)
+        return moves
+
+    def record_cutoff(self, move, ply, depth, is_white):
+        """
+        Updates the killer moves and the history table with a quiet move that caused a cutoff
+        """
+        if move.captured:
+            return
+
+        if ply < len(self.killer_moves):
+            killer_moves = self.killer_moves[ply]
+            if killer_moves[0] != move:
+                killer_moves[1] = killer_moves[0]
+                killer_moves[0] = move
+
+        index = (1024 if is_white else 0) + 32 * move.source + move.target
+        self.history[index] += depth * depth
+        if self.history[index] > MAX_HISTORY_SCORE:
+            self.age_history()
@@ -0,0 +1,46 @@
+from square import Square
+
+# Row direction in which the men of each team move, white starts at the top rows and black at the bottom rows
+FORWARD_ROW_DIRECTIONS = {"white": 1, "black": -1}
+
+
+def compute_step_squares(square_number, row_directions):
+    """"
+    Returns a tuple of the squares diagonally adjacent to the given square in the given row directions
+    """
+    row, col = Square.compute_row_and_col(square_number)
+    return tuple(Square.compute_square_number(row + row_direction, col + col_direction)
+                 for row_direction in row_directions for col_direction in (-1, 1)
+                 if 1 <= row + row_direction <= 8 and 1 <= col + col_direction <= 8)
+
+
+def compute_jumps(square_number, row_directions):
+    """"
+    Returns a tuple of (jumped square, landing square) pairs of the captures from the given square in the given
+    row directions
+    """
+    row, col = Square.compute_row_and_col(square_number)
+    return tuple((Square.compute_square_number(row + row_direction, col + col_direction),
+                  Square.compute_square_number(row + 2 * row_direction, col + 2 * col_direction))
+                 for row_direction in row_directions for col_direction in (-1, 1)
+                 if 1 <= row + 2 * row_direction <= 8 and 1 <= col + 2 * col_direction <= 8)
+
+
+def build_table(compute_targets):
+    """"
+    Returns a table indexed by color, then by whether the piece is a queen, then by square number (1-64)
+    """
+    table = {}
+    for color, forward_row_direction in FORWARD_ROW_DIRECTIONS.items():
+        pawn_targets = tuple(compute_targets(square_number, (forward_row_direction,))
+                             for square_number in range(1, 65))
+        queen_targets = tuple(compute_targets(square_number, (forward_row_direction, -forward_row_direction))
+                              for square_number in range(1, 65))
+        # The dummy square 0 has no targets
+        table[color] = (((),) + pawn_targets, ((),) + queen_targets)
+    return table
+
+
+# Built once at import, e.g. STEP_SQUARES["white"][is_queen][square_number]
+STEP_SQUARES = build_table(compute_step_squares)
+JUMPS = build_table(compute_jumps)
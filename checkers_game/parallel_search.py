@@ -0,0 +1,89 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import BitBoard
+
+# State of a worker process, set once by its initializer
+worker_move_handler = None
+worker_shared_alpha = None
+worker_barrier = None
+# The search of a move whose root moves the worker last searched
+worker_root_search_id = None
+
+
+def create_executor(num_workers, difficulty, evaluator, quantized):
+    """
+    Creates a process pool whose workers share the root's alpha value and a stop flag, and waits for all of them to
+    be loaded, so that the first timed search doesn't start them.
+
+    Returns the executor, the shared alpha value and the stop flag, which makes the workers drop their searches.
+    """
+    # Spawned workers don't inherit the parent's pygame state
+    context = multiprocessing.get_context("spawn")
+    shared_alpha = context.Value('d', float('-inf'))
+    stop_event = context.Event()
+    barrier = context.Barrier(num_workers)
+    executor = ProcessPoolExecutor(max_workers=num_workers, mp_context=context, initializer=init_worker,
+                                   initargs=(difficulty, evaluator, quantized, shared_alpha, stop_event, barrier))
+    # Each worker blocks on the barrier until all are loaded, so every process takes one of these tasks
+    for future in [executor.submit(wait_for_workers) for _ in range(num_workers)]:
+        future.result()
+    return executor, shared_alpha, stop_event
+
+
+def init_worker(difficulty, evaluator, quantized, shared_alpha, stop_event, barrier):
+    """
+    Loads the worker's own search, with its agent and transposition table, once per process
+    """
+    global worker_move_handler, worker_shared_alpha, worker_barrier
+    from agent_move_handler import AgentMoveHandler
+
+    worker_move_handler = AgentMoveHandler(difficulty, evaluator=evaluator, quantized=quantized)
+    # The search checks the stop flag and the shared alpha between its nodes
+    worker_move_handler.cancel_event = stop_event
+    worker_move_handler.shared_root_alpha = shared_alpha
+    worker_shared_alpha = shared_alpha
+    worker_barrier = barrier
+
+
+def wait_for_workers():
+    worker_barrier.wait()
+
+
+def search_root_move(white, black, kings, move, depth, search_depth, deadline, root_search_id):
+    """
+    Scores a root move of the white team, searching with the best root score found so far by any worker as alpha.
+    The search raises its alpha when another worker finds a better root move. The deadline is on the monotonic
+    clock, the same in all processes, so a task that waited in the pool's queue has no more time than the others.
+
+    Returns None if the move can't be better than the best root move, its score then being only an upper bound.
+    """
+    global worker_root_search_id
+    move_handler = worker_move_handler
+    # The first task of a new search ages the worker's table and resets its killer moves and history, as find_move
+    # does in the main process
+    if root_search_id != worker_root_search_id:
+        move_handler.transposition_table.new_search()
+        move_handler.move_orderer.new_search()
+        worker_root_search_id = root_search_id
+    move_handler.search_depth = search_depth
+    move_handler.deadline = deadline
+
+    position = BitBoard(white, black, kings)
+    move_handler.attach_accumulator(position)
+    move_handler.alpha_floor = worker_shared_alpha.value
+    position.apply_move(move, is_white=True)
+    move_score = move_handler.minimax(position, depth + 1, move_handler.alpha_floor, float('inf'),
+                                      is_maximizing_turn=False)
+
+    # Above every alpha the search used, the score is exact
+    if move_score <= move_handler.alpha_floor:
+        return None
+    update_shared_alpha(worker_shared_alpha, move_score)
+    return move_score
+
+
+def update_shared_alpha(shared_alpha, move_score):
+    with shared_alpha.get_lock():
+        if move_score > shared_alpha.value:
+            shared_alpha.value = move_score
@@ -1,5 +1,6 @@
 import os
 import pygame
+import move_tables
 from square import Square
 
 
@@ -56,48 +57,16 @@ class Pawn:
 
     def compute_possible_squares(self):
         """"
-        Returns a set of the initial possible squares for the pawn to move to
+        Returns a tuple of the initial possible squares for the pawn to move to
         """
-        possible_squares = set()
-        square_number = self.square_number
-
-        if self.color_type == "black":
-            # Leftmost col
-            if square_number % 8 == 1:
-                possible_squares.add(square_number - 7)
-            # Rightmost col
-            elif square_number % 8 == 0:
-                possible_squares.add(square_number - 9)
-            else:
-                possible_squares.add(square_number - 9)
-                possible_squares.add(square_number - 7)
-        # color_type = "white"
-        else:
-            # Leftmost col
-            if square_number % 8 == 1:
-                possible_squares.add(square_number + 9)
-            # Rightmost col
-            elif square_number % 8 == 0:
-                possible_squares.add(square_number + 7)
-            else:
-                possible_squares.add(square_number + 9)
-                possible_squares.add(square_number + 7)
-
-        return possible_squares
+        return move_tables.STEP_SQUARES[self.color_type][self.queen][self.square_number]
 
     @staticmethod
     def filter_invalid_squares(possible_squares, board):
         """"
-        Removes the invalid squares from the possible squares set
+        Returns a set of the free squares among the possible squares
         """
-        next_squares = set(possible_squares)
-        to_remove = set()
-        for square_number in next_squares:
-            if not board.is_square_valid_and_free(square_number):
-                to_remove.add(square_number)
-
-        next_squares -= to_remove
-        return next_squares
+        return {square_number for square_number in possible_squares if board.squares[square_number].free}
 
     def get_next_jumping_squares(self, board):
         """"
@@ -105,46 +74,30 @@ class Pawn:
         """
         jumping_squares = set()
 
-        for jump_square_number in self.get_possible_jump_squares():
-            if self.is_legal_jump_square(board, jump_square_number):
+        for opponent_square_number, jump_square_number in self.get_possible_jumps():
+            if self.is_legal_jump(board, opponent_square_number, jump_square_number):
                 jumping_squares.add(jump_square_number)
 
         self.can_eat = bool(jumping_squares)
 
         return jumping_squares
 
-    def get_possible_jump_squares(self):
+    def get_possible_jumps(self):
         """"
-        Returns an initial list of tuples of rows and columns that the pawn can jump to
+        Returns a tuple of (opponent square, jump square) pairs of the pawn's possible captures, queens can capture
+        backwards
         """
-        possible_jump_squares = []
-
-        for square_number in [self.square_number - 18, self.square_number - 14, self.square_number + 14,
-                              self.square_number + 18]:
-            _, col = Square.compute_row_and_col(square_number)
-            if Square.is_valid_square_number(square_number) and abs(self.col - col) <= 2:
-                possible_jump_squares.append(square_number)
+        return move_tables.JUMPS[self.color_type][self.queen][self.square_number]
 
-        return possible_jump_squares
-
-    def is_legal_jump_square(self, board, jump_square_number):
+    def is_legal_jump(self, board, opponent_square_number, jump_square_number):
         """"
-        Indicates whether the pawn can jump to the given square
+        Indicates whether the pawn can capture the given square's opponent by jumping to the given square
         """
-        jump_square = board.squares[jump_square_number]
-
-        if jump_square.free:
-            opponent_square_number = Pawn.compute_opponent_square_number(self.square_number, jump_square_number)
-            opponent = board.get_occupying_pawn(opponent_square_number)
-
-            if not opponent or self.is_same_team(opponent):
-                return False
+        if not board.squares[jump_square_number].free:
+            return False
 
-            opponent_row = opponent.row
-            if self.is_legal_capture(opponent_row):
-                return True
-
-        return False
+        opponent = board.get_occupying_pawn(opponent_square_number)
+        return opponent is not None and not self.is_same_team(opponent)
 
     @staticmethod
     def compute_opponent_square_number(start_square_number, jump_square_number):
@@ -156,11 +109,6 @@ class Pawn:
     def is_same_team(self, opponent):
         return self.color_type == opponent.color_type
 
-    def is_legal_capture(self, opponent_row):
-        # Only queens can capture backwards
-        return self.queen or (self.color_type == "black" and self.row > opponent_row) or (
-                    self.color_type == "white" and self.row < opponent_row)
-
     def highlight(self, ui):
         ui.draw_highlight_pawn(self.center, self.radius)
         self.highlighted = True
@@ -32,31 +32,6 @@ class Queen(Pawn):
         crown_y = self.center[1] - 0.8 * self.radius
         return crown_x, crown_y
 
-    def compute_possible_squares(self):
-        """
-        Overrides the original computePossibleSquares method of the Pawn class.
-
-        Queens can move backwards.
-        """
-        square_number = self.square_number
-        possible_squares = {
-            square_number - 9,
-            square_number - 7,
-            square_number + 7,
-            square_number + 9
-        }
-
-        # Leftmost col
-        if square_number % 8 == 1:
-            possible_squares.remove(square_number - 9)
-            possible_squares.remove(square_number + 7)
-        # Rightmost col
-        elif square_number % 8 == 0:
-            possible_squares.remove(square_number - 7)
-            possible_squares.remove(square_number + 9)
-
-        return possible_squares
-
     def copy(self):
         queen_copy = Queen(self.col, self.row, self.square_size, self.color_type, self.radius, is_original_queen=False)
         queen_copy.highlighted = self.highlighted
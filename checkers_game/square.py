@@ -35,10 +35,6 @@ class Square:
     def deselect(self):
         self.selected = False
 
-    @staticmethod
-    def is_valid_square_number(square_number):
-        return True if 1 <= square_number <= 64 else False
-
     def copy(self):
         square_copy = copy.deepcopy(self)
         square_copy.free = self.free
@@ -0,0 +1,89 @@
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Approximate memory taken by one entry: a pointer in each of the five slot lists plus the key and score objects
+ENTRY_SIZE_BYTES = 100
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of search results, indexed by the low bits of the position's Zobrist key.
+
+    Each slot holds a single entry (key, depth, bound type, score, best move). A new result replaces the stored
+    one when it belongs to the same position, when the stored one comes from an older search, or when it was
+    searched at least as deep.
+    """
+
+    def __init__(self, size_mb=16):
+        num_entries = max(1, size_mb * 1024 * 1024 // ENTRY_SIZE_BYTES)
+        # Round down to a power of two so that the slot is found with a mask
+        self.size = 1 << (num_entries.bit_length() - 1)
+        self.mask = self.size - 1
+
+        self.keys = [None] * self.size
+        self.depths = [0] * self.size
+        self.bound_types = [EXACT] * self.size
+        self.scores = [0.0] * self.size
+        self.best_moves = [None] * self.size
+        self.generations = [0] * self.size
+
+        self.generation = 0
+
+    def new_search(self):
+        """
+        Marks the stored entries as coming from an older search, so they are the first to be replaced
+        """
+        self.generation += 1
+
+    def probe(self, key):
+        """
+        Returns the slot holding the given position, or None if it isn't stored
+        """
+        slot = key & self.mask
+        if self.keys[slot] == key:
+            return slot
+        return None
+
+    def store(self, key, depth, bound_type, score, best_move):
+        slot = key & self.mask
+        stored_key = self.keys[slot]
+        if (stored_key is not None and stored_key != key and self.generations[slot] == self.generation and
+                self.depths[slot] > depth):
+            return
+
+        # Keep the known best move when the new result doesn't have one
+        if best_move is None and stored_key == key:
+            best_move = self.best_moves[slot]
+
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.bound_types[slot] = bound_type
+        self.scores[slot] = score
+        self.best_moves[slot] = best_move
+        self.generations[slot] = self.generation
+
+    def get_cutoff_score(self, slot, depth, alpha, beta):
+        """
+        Returns the stored score if it settles a search of the given depth and window, otherwise None
+        """
+        if self.depths[slot] < depth:
+            return None
+
+        score = self.scores[slot]
+        bound_type = self.bound_types[slot]
+        if (bound_type == EXACT or (bound_type == LOWER_BOUND and score >= beta) or
+                (bound_type == UPPER_BOUND and score <= alpha)):
+            return score
+        return None
+
+    @staticmethod
+    def get_bound_type(score, alpha, beta):
+        """
+        Returns the bound type of a score found by a search with the given (original) window
+        """
+        if score <= alpha:
+            return UPPER_BOUND
+        if score >= beta:
+            return LOWER_BOUND
+        return EXACT
@@ -83,7 +83,7 @@ class UI:
         pygame.display.flip()
 
         while True:
-            for event in pygame.event.get():
+            for event in self.get_events():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -93,6 +93,13 @@ class UI:
                     if self.button_handler.is_click_on_general_button(mouse_pos, "got_it_game_rules"):
                         return
 
+    @staticmethod
+    def get_events():
+        """
+        Returns the pending events, leaving the agent's moves in the queue for the game loop
+        """
+        return pygame.event.get(exclude=constants.AGENT_MOVE_EVENT)
+
     def init_game_rules_rendered_text(self):
         game_rules_file_path = self.get_file_path("game_rules.txt")
         with open(game_rules_file_path, 'rt') as file:
@@ -133,7 +140,7 @@ class UI:
         pygame.display.flip()
 
         while True:
-            for event in pygame.event.get():
+            for event in self.get_events():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -162,7 +169,7 @@ class UI:
         pygame.display.flip()
 
         while True:
-            for event in pygame.event.get():
+            for event in self.get_events():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -192,7 +199,7 @@ class UI:
         pygame.display.flip()
 
         while True:
-            for event in pygame.event.get():
+            for event in self.get_events():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -222,7 +229,7 @@ class UI:
         pygame.display.flip()
 
         while True:
-            for event in pygame.event.get():
+            for event in self.get_events():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -249,7 +256,7 @@ class UI:
         pygame.display.flip()
 
         while True:
-            for event in pygame.event.get():
+            for event in self.get_events():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
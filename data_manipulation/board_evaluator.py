@@ -189,6 +189,114 @@ def get_metrics(board):  # returns [label, 10 labeling metrics]
     return np.array([score, capped, potential, men, kings, caps, semicaps, uncaps, mid, far, won])
 
 
+# batched versions of the metrics, over an (N, 8, 8) stack of boards, with the same results as the functions above
+def reverse_batch(boards):
+    return -boards[:, ::-1, ::-1]
+
+
+def num_branches_batch(boards):  # sum of num_branches over the pieces of each board
+    counts = np.zeros(len(boards), dtype=int)
+    # jump states: board, logical position, piece type, source square and captured squares (bit r * 8 + c)
+    board_ids, xs, ys = np.nonzero(boards > 0)
+    is_king = boards[board_ids, xs, ys] == 3
+    sources = xs * 8 + ys
+    captured = np.zeros(len(board_ids), dtype=np.uint64)
+
+    while len(board_ids):
+        next_states = []
+        for dx, dy in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+            # a king's backward jump from row 1 wraps around to row 7 (x = -1), as numpy's negative indexing does
+            valid = (xs < 6) if dx == 1 else (is_king & (xs > 0))
+            valid &= (ys < 6) if dy == 1 else (ys > 1)
+            ids = np.nonzero(valid)[0]
+            b, x, y, cap = board_ids[ids], xs[ids], ys[ids], captured[ids]
+            jumped_x, jumped_y = (x + dx) % 8, y + dy
+            landing_x, landing_y = (x + 2 * dx) % 8, y + 2 * dy
+            jumped_bit = np.left_shift(np.uint64(1), (jumped_x * 8 + jumped_y).astype(np.uint64))
+            landing = landing_x * 8 + landing_y
+            landing_bit = np.left_shift(np.uint64(1), landing.astype(np.uint64))
+
+            # captured pieces and the piece's source square are empty while the jumps go on
+            is_opponent = (boards[b, jumped_x, jumped_y] < 0) & ((cap & jumped_bit) == 0)
+            is_free = (boards[b, landing_x, landing_y] == 0) | ((cap & landing_bit) != 0) | (landing == sources[ids])
+            jumps = np.nonzero(is_opponent & is_free)[0]
+
+            counts += np.bincount(b[jumps], minlength=len(boards))
+            next_states.append((b[jumps], x[jumps] + 2 * dx, y[jumps] + 2 * dy, is_king[ids][jumps],
+                                sources[ids][jumps], cap[jumps] | jumped_bit[jumps]))
+
+        board_ids, xs, ys, is_king, sources, captured = (np.concatenate(arrays) for arrays in zip(*next_states))
+
+    return counts
+
+
+def possible_moves_batch(boards):
+    branches = num_branches_batch(boards)
+    movers = boards >= 1
+    kings = boards == 3
+    empty = boards == 0
+    count = np.sum(movers[:, :7, :7] & empty[:, 1:, 1:], axis=(1, 2)) + \
+        np.sum(movers[:, :7, 1:] & empty[:, 1:, :7], axis=(1, 2))
+    # backwards, a king that isn't on the last column only counts its move to the right
+    count += np.sum(kings[:, 1:, :7] & empty[:, :7, 1:], axis=(1, 2)) + \
+        np.sum(kings[:, 1:, 7] & empty[:, :7, 6], axis=1)
+    return np.where(branches > 0, branches, count)
+
+
+def game_winner_batch(boards, own_moves, opponent_moves):
+    no_opponent = ~np.any(boards < 0, axis=(1, 2))
+    no_own = ~np.any(boards > 0, axis=(1, 2))
+    return np.select([no_opponent, no_own, own_moves == 0, opponent_moves == 0], [1, -1, -1, 1], 0)
+
+
+def num_own_batch(boards, rows):  # number of own units (men or kings) in the given rows
+    units = (boards[:, rows] == 1) | (boards[:, rows] == 3)
+    return np.sum(units, axis=(1, 2))
+
+
+def capturables_batch(boards):
+    free = boards >= 0
+    unsupported = (boards[:, 1:7, 1:7] < 0) & free[:, 2:, 2:] & free[:, 2:, :6] & free[:, :6, 2:] & free[:, :6, :6]
+    return np.sum(unsupported, axis=(1, 2))
+
+
+def uncapturables_batch(boards):
+    own = boards > 0
+    down_right, down_left, up_right, up_left = own[:, 2:, 2:], own[:, 2:, :6], own[:, :6, 2:], own[:, :6, :6]
+    supported = (down_right & down_left) | (up_right & up_left) | (down_right & up_right) | (down_left & up_left)
+    count = np.sum(own[:, 1:7, 1:7] & supported, axis=(1, 2))
+    units = (boards == 1) | (boards == 3)
+    count += np.sum(units[:, 0], axis=1) + np.sum(units[:, 7], axis=1) + np.sum(units[:, 1:7, 0], axis=1) + \
+        np.sum(units[:, 1:7, 7], axis=1)
+    return count
+
+
+def get_metrics_batch(boards):  # returns an (N, 11) array, row i is get_metrics(boards[i])
+    b = np.asarray(boards)
+    r = reverse_batch(b)
+
+    own_moves = possible_moves_batch(b)
+    opponent_moves = possible_moves_batch(r)
+    own_caps = capturables_batch(b)
+    opponent_caps = capturables_batch(r)
+    own_uncaps = uncapturables_batch(b)
+
+    capped = 12 - np.sum(b < 0, axis=(1, 2))
+    potential = own_moves - opponent_moves
+    men = np.sum(b == 1, axis=(1, 2)) - np.sum(b == -1, axis=(1, 2))
+    kings = np.sum(b == 3, axis=(1, 2)) - np.sum(b == -3, axis=(1, 2))
+    caps = own_caps - opponent_caps
+    semicaps = 12 - own_uncaps - opponent_caps
+    uncaps = own_uncaps - uncapturables_batch(r)
+    mid = num_own_batch(b, slice(3, 5)) - num_own_batch(-b, slice(3, 5))
+    far = num_own_batch(b, slice(5, 8)) - num_own_batch(r, slice(5, 8))
+    won = game_winner_batch(b, own_moves, opponent_moves)
+
+    score = 4 * capped + potential + men + 3 * kings + caps + 2 * semicaps + 3 * uncaps + 2 * mid + 3 * far + 100 * won
+
+    return np.stack([score, capped, potential, men, kings, caps, semicaps, uncaps, mid, far, won], axis=1)
+
+
 def np_board():
     return np.array(get_board())
 
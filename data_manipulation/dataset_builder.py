@@ -0,0 +1,221 @@
+import os
+import time
+import shutil
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from game_parser import GameParser
+from pdn_index import PdnIndex
+from pdn_reader import hash_game_record, is_gzip_file, read_games
+from dataset_writer import DatasetWriter, get_shard_paths
+from dataset_manifest import DatasetManifest, ManifestWriter
+
+# Games parsed by a worker at a time, each chunk is written to its own shards
+CHUNK_SIZE = 256
+# Plies in a chunk when the database is indexed, the chunks then take about the same time to parse
+CHUNK_PLIES = 1 << 14
+# Chunks submitted to each worker ahead of the merge, which bounds the memory taken by the pending ones
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+# Seconds between two progress reports
+PROGRESS_INTERVAL = 5.0
+PARTS_DIRECTORY = "parts"
+
+# The PDN index of a worker process, which reads its chunks from the memory-mapped database
+worker_pdn_index = None
+
+
+class BuildProgress:
+    """
+    Counts the games and plies (one board per ply) added to the dataset, and reports the build's throughput
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.last_report_time = self.start_time
+        self.num_games = 0
+        self.num_plies = 0
+
+    def add(self, num_games, num_plies):
+        self.num_games += num_games
+        self.num_plies += num_plies
+        now = time.perf_counter()
+        if now - self.last_report_time >= PROGRESS_INTERVAL:
+            self.last_report_time = now
+            self.report()
+
+    def report(self, prefix=""):
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9)
+        print(f"{prefix}{self.num_games} games, {self.num_plies} plies in {elapsed:.1f}s: "
+              f"{self.num_games / elapsed:.0f} games/s, {self.num_plies / elapsed:.0f} plies/s", flush=True)
+
+
+def build_dataset(pdn_path, directory, num_workers=1, rebuild=False):
+    """
+    Adds the games of a PDN database to the dataset's shards, with the given number of worker processes.
+
+    The dataset's manifest records the games it has by the hash of their move record, so only the database's new
+    games are parsed, and the games it no longer has (e.g. changed since the last build) are removed. The manifest
+    is saved with each shard, an interrupted build resumes from there. With rebuild, the dataset is built from
+    scratch.
+
+    The workers write the chunks of games to their own shards, which are merged in the order of the games, so the
+    dataset is the same whatever the number of workers.
+    """
+    manifest = DatasetManifest(directory)
+    if rebuild:
+        manifest.clear()
+        manifest.save()
+    # The shards saved after the last checkpoint of an interrupted build are dropped, their games are parsed again
+    manifest.remove_unreferenced_shards()
+    source_id = manifest.get_source_id(pdn_path)
+    # The database's games are counted off the ones the dataset has, those left at the end are no longer in it
+    known_games = manifest.get_game_counts(source_id)
+    num_known_games = sum(known_games.values())
+
+    progress = BuildProgress()
+    with ManifestWriter(manifest, source_id) as dataset_writer:
+        if num_workers == 1:
+            for game_hash, game_record in read_new_games(pdn_path, known_games):
+                start_rows = dataset_writer.get_row_count()
+                dataset_writer.start_game(game_hash)
+                GameParser.parse_game(game_record, dataset_writer)
+                dataset_writer.end_game()
+                progress.add(1, dataset_writer.get_row_count() - start_rows)
+        else:
+            build_in_parallel(pdn_path, directory, num_workers, known_games, dataset_writer, progress)
+
+    num_removed_games = manifest.remove_games(source_id, known_games)
+    progress.report(prefix="Done: ")
+    print(f"{num_known_games - num_removed_games} games were already in the dataset, {num_removed_games} removed")
+
+
+def take_known_game(known_games, game_hash):
+    """
+    Returns whether a game of the database is already in the dataset, counting it off the known games
+    """
+    if known_games[game_hash] > 0:
+        known_games[game_hash] -= 1
+        return True
+    return False
+
+
+def read_new_games(pdn_path, known_games):
+    """
+    Yields the (hash, record) pairs of the database's new games. An uncompressed database is read through its index,
+    so the text of the games the dataset has isn't read. A compressed one is read and hashed whole.
+    """
+    if is_gzip_file(pdn_path):
+        for game_record in read_games(pdn_path):
+            game_hash = hash_game_record(game_record)
+            if not take_known_game(known_games, game_hash):
+                yield game_hash, game_record
+    else:
+        with PdnIndex(pdn_path) as pdn_index:
+            for game_number, game_hash in enumerate(pdn_index.games['hash'].tolist()):
+                if not take_known_game(known_games, game_hash):
+                    yield game_hash, pdn_index.get_game(game_number)
+
+
+def build_in_parallel(pdn_path, directory, num_workers, known_games, dataset_writer, progress):
+    parts_directory = os.path.join(directory, PARTS_DIRECTORY)
+    # The parts left by an interrupted build
+    shutil.rmtree(parts_directory, ignore_errors=True)
+    if is_gzip_file(pdn_path):
+        # A compressed database can't be read from offsets, its games are read here and sent to the workers
+        chunks = get_streamed_chunks(pdn_path, known_games)
+        parse_function, initializer, initargs = parse_chunk, None, ()
+    else:
+        # The database is indexed (or its index loaded) once, the workers then only get the numbers of their games
+        with PdnIndex(pdn_path) as pdn_index:
+            game_hashes = pdn_index.games['hash'].tolist()
+            game_ranges = pdn_index.split_by_plies(max(1, -(-pdn_index.get_ply_count() // CHUNK_PLIES)))
+        chunks = get_indexed_chunks(game_hashes, game_ranges, known_games)
+        parse_function, initializer, initargs = parse_indexed_chunk, init_worker, (pdn_path,)
+
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=initializer, initargs=initargs) as executor:
+        pending = deque()
+        for chunk_index, chunk in enumerate(chunks):
+            game_hashes, games = zip(*chunk)
+            pending.append((executor.submit(parse_function, chunk_index, list(games), parts_directory), game_hashes))
+            if len(pending) >= CHUNKS_IN_FLIGHT_PER_WORKER * num_workers:
+                merge_chunk(pending.popleft(), parts_directory, dataset_writer, progress)
+        while pending:
+            merge_chunk(pending.popleft(), parts_directory, dataset_writer, progress)
+
+    if os.path.isdir(parts_directory) and not os.listdir(parts_directory):
+        os.rmdir(parts_directory)
+
+
+def get_streamed_chunks(pdn_path, known_games):
+    """
+    Returns an iterator over the chunks of the database's new games, as lists of (hash, record) pairs
+    """
+    new_games = read_new_games(pdn_path, known_games)
+    return iter(lambda: list(itertools.islice(new_games, CHUNK_SIZE)), [])
+
+
+def get_indexed_chunks(game_hashes, game_ranges, known_games):
+    """
+    Yields the chunks of the database's new games as lists of (hash, game number) pairs, one chunk per range of
+    games that has new ones
+    """
+    for start, stop in game_ranges:
+        chunk = [(game_hashes[game_number], game_number) for game_number in range(start, stop)
+                 if not take_known_game(known_games, game_hashes[game_number])]
+        if chunk:
+            yield chunk
+
+
+def init_worker(pdn_path):
+    global worker_pdn_index
+    worker_pdn_index = PdnIndex(pdn_path)
+
+
+def get_chunk_prefix(chunk_index):
+    return f"part_{chunk_index:06d}"
+
+
+def parse_chunk(chunk_index, game_records, parts_directory):
+    """
+    Parses a chunk of games in a worker process into the chunk's own shards.
+
+    Returns the chunk's index, and the number of plies of each of its games.
+    """
+    game_plies = []
+    with DatasetWriter(parts_directory, prefix=get_chunk_prefix(chunk_index)) as chunk_writer:
+        for game_record in game_records:
+            start_rows = chunk_writer.get_row_count()
+            GameParser.parse_game(game_record, chunk_writer)
+            game_plies.append(chunk_writer.get_row_count() - start_rows)
+    return chunk_index, game_plies
+
+
+def parse_indexed_chunk(chunk_index, game_numbers, parts_directory):
+    """
+    Parses the games of a chunk, read by their numbers from the worker's memory-mapped database
+    """
+    return parse_chunk(chunk_index, [worker_pdn_index.get_game(game_number) for game_number in game_numbers],
+                       parts_directory)
+
+
+def merge_chunk(pending_chunk, parts_directory, dataset_writer, progress):
+    """
+    Moves the rows of a parsed chunk to the dataset one game at a time, then deletes the chunk's shards. The chunks
+    are merged in the order they were read.
+    """
+    future, game_hashes = pending_chunk
+    chunk_index, game_plies = future.result()
+    shard_paths = get_shard_paths(parts_directory, get_chunk_prefix(chunk_index))
+    rows = np.concatenate([np.load(path) for path in shard_paths]) if shard_paths else None
+    start = 0
+    for game_hash, num_plies in zip(game_hashes, game_plies):
+        dataset_writer.start_game(game_hash)
+        if num_plies:
+            dataset_writer.add_raw_rows(rows[start:start + num_plies])
+            start += num_plies
+        dataset_writer.end_game()
+    for path in shard_paths:
+        os.remove(path)
+    progress.add(len(game_plies), sum(game_plies))
@@ -0,0 +1,167 @@
+import os
+from collections import Counter
+import numpy as np
+
+from dataset_writer import DEFAULT_SHARD_SIZE, DatasetWriter, get_shard_path, get_shard_paths
+
+# One entry per game of the dataset: the hash of its move record, the PDN database it was read from, and the shard,
+# first row and number of rows (plies) of its boards. A game's rows are always in a single shard, a game without
+# any board has an empty row range.
+MANIFEST_DTYPE = np.dtype([('hash', '<u8'), ('source', '<u2'), ('shard', '<u4'), ('row', '<u4'), ('plies', '<u2')])
+MANIFEST_FILENAME = "manifest.npz"
+
+
+class DatasetManifest:
+    """
+    Records the games whose rows are saved in a dataset's shards, so that a build only parses the games it doesn't
+    have yet. The manifest is saved after each shard, a build that is interrupted resumes from the last saved one.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_FILENAME)
+        if os.path.exists(self.path):
+            with np.load(self.path) as manifest:
+                self.games = manifest['games']
+                self.sources = manifest['sources'].tolist()
+                self.next_shard = int(manifest['next_shard'])
+        else:
+            self.clear()
+
+    def clear(self):
+        self.games = np.empty(0, dtype=MANIFEST_DTYPE)
+        self.sources = []
+        self.next_shard = 0
+
+    def save(self):
+        # The manifest is replaced at once, an interruption leaves the previous one
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, games=self.games, sources=np.array(self.sources, dtype=str), next_shard=self.next_shard)
+        os.replace(temporary_path, self.path)
+
+    def get_source_id(self, pdn_path):
+        """
+        Returns the id of a PDN database, by its absolute path, adding it to the sources if it's new
+        """
+        pdn_path = os.path.abspath(pdn_path)
+        if pdn_path not in self.sources:
+            self.sources.append(pdn_path)
+        return self.sources.index(pdn_path)
+
+    def get_game_counts(self, source_id):
+        """
+        Returns how many times each game hash of a source is in the dataset, a database may repeat a game
+        """
+        return Counter(self.games['hash'][self.games['source'] == source_id].tolist())
+
+    def add_games(self, source_id, shard_number, games):
+        """
+        Records the (hash, row, plies) games of a saved shard, which isn't saved if none of them has a row
+        """
+        entries = np.array([(game_hash, source_id, shard_number, row, plies) for game_hash, row, plies in games],
+                           dtype=MANIFEST_DTYPE)
+        self.games = np.concatenate((self.games, entries))
+        if entries['plies'].any():
+            self.next_shard = max(self.next_shard, shard_number + 1)
+
+    def remove_games(self, source_id, game_counts):
+        """
+        Removes games of a source from the dataset, game_counts giving how many times to remove each hash. The
+        shards holding their rows are rewritten without them, under new numbers.
+
+        Returns the number of games removed.
+        """
+        game_counts = Counter(game_counts)
+        removed = np.zeros(len(self.games), dtype=bool)
+        for entry in np.flatnonzero(self.games['source'] == source_id)[::-1]:
+            game_hash = int(self.games['hash'][entry])
+            if game_counts[game_hash] > 0:
+                game_counts[game_hash] -= 1
+                removed[entry] = True
+        if not removed.any():
+            return 0
+
+        # Only the games with rows are in their shard's file
+        has_rows = self.games['plies'] > 0
+        for shard_number in np.unique(self.games['shard'][removed & has_rows]):
+            in_shard = np.flatnonzero((self.games['shard'] == shard_number) & has_rows)
+            in_shard = in_shard[np.argsort(self.games['row'][in_shard])]
+            kept = in_shard[~removed[in_shard]]
+            if len(kept) == 0:
+                continue
+            rows = np.load(get_shard_path(self.directory, shard_number))
+            starts, plies = self.games['row'][kept], self.games['plies'][kept].astype(np.int64)
+            kept_rows = [rows[start:start + count] for start, count in zip(starts.tolist(), plies.tolist())]
+            np.save(get_shard_path(self.directory, self.next_shard), np.concatenate(kept_rows))
+            self.games['shard'][kept] = self.next_shard
+            self.games['row'][kept] = np.cumsum(plies) - plies
+            self.next_shard += 1
+
+        # The old shards are deleted once the manifest no longer refers to them
+        self.games = self.games[~removed]
+        self.save()
+        self.remove_unreferenced_shards()
+        return int(removed.sum())
+
+    def remove_unreferenced_shards(self):
+        """
+        Deletes the shards that no game of the manifest is in: those saved by an interrupted build after its last
+        checkpoint, or replaced by remove_games
+        """
+        referenced_paths = {get_shard_path(self.directory, shard_number)
+                            for shard_number in np.unique(self.games['shard'][self.games['plies'] > 0]).tolist()}
+        for path in get_shard_paths(self.directory):
+            if path not in referenced_paths:
+                os.remove(path)
+
+
+class ManifestWriter(DatasetWriter):
+    """
+    Adds the games of a source to a dataset after its existing shards. Each game's rows are kept in a single shard,
+    and the games of a shard are recorded in the manifest once it's saved.
+    """
+
+    def __init__(self, manifest, source_id, shard_size=DEFAULT_SHARD_SIZE):
+        super().__init__(manifest.directory, shard_size, first_shard=manifest.next_shard)
+        self.manifest = manifest
+        self.source_id = source_id
+        self.game_hash = None
+        # The (hash, row, plies) games of the current block
+        self.block_games = []
+
+    def start_game(self, game_hash):
+        """
+        Sets the hash of the game whose rows are added next, all of them in a single call, before end_game
+        """
+        self.game_hash = game_hash
+
+    def end_game(self):
+        """
+        Ends the started game. A game that added no row, e.g. one without any move, is recorded with an empty row
+        range, so that it isn't parsed again.
+        """
+        if self.game_hash is not None:
+            self.block_games.append((self.game_hash, self.num_rows, 0))
+            self.game_hash = None
+
+    def add_raw_rows(self, rows):
+        if self.game_hash is None:
+            raise ValueError("The rows' game must be started with start_game before they are added")
+        if len(rows) > len(self.block):
+            raise ValueError(f"A game's {len(rows)} rows don't fit in a shard of {len(self.block)} rows")
+        # A game that doesn't fit in the current block starts the next one
+        if self.num_rows + len(rows) > len(self.block):
+            self.flush()
+        self.block_games.append((self.game_hash, self.num_rows, len(rows)))
+        self.game_hash = None
+        super().add_raw_rows(rows)
+
+    def flush(self):
+        shard_number = self.next_shard
+        super().flush()
+        if self.block_games:
+            self.manifest.add_games(self.source_id, shard_number, self.block_games)
+            self.manifest.save()
+            self.block_games = []
@@ -0,0 +1,116 @@
+import os
+import glob
+import numpy as np
+
+# Each row holds a board's 11 metrics, its game's outcome, then its 32 playable squares (in the order of the
+# bitboard indices). All of them fit in 16 bits.
+NUM_METRICS = 11
+OUTCOME_COLUMN = NUM_METRICS
+POSITION_COLUMNS = slice(NUM_METRICS + 1, NUM_METRICS + 33)
+NUM_COLUMNS = NUM_METRICS + 33
+ROW_DTYPE = np.int16
+# Rows per shard file, a full shard takes 88 bytes per row
+DEFAULT_SHARD_SIZE = 1 << 18
+DEFAULT_PREFIX = "board_evals"
+
+
+class DatasetWriter:
+    """
+    Buffers the dataset's rows in a preallocated block and saves each full block as an .npy shard, which np.load
+    can memory-map. Used as a context manager, the last partial block is saved on exit.
+
+    The shards are numbered from first_shard, a later one adds shards to an existing dataset.
+    """
+
+    def __init__(self, directory, shard_size=DEFAULT_SHARD_SIZE, prefix=DEFAULT_PREFIX, first_shard=0):
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+        # A new dataset replaces the previous one, whose shards would otherwise be loaded with the new ones
+        if first_shard == 0:
+            for path in get_shard_paths(directory, prefix):
+                os.remove(path)
+        self.block = np.empty((shard_size, NUM_COLUMNS), dtype=ROW_DTYPE)
+        self.num_rows = 0
+        self.next_shard = first_shard
+        self.total_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_row_count(self):
+        """
+        Returns the number of rows added so far, saved or still buffered
+        """
+        return self.total_rows + self.num_rows
+
+    def add_rows(self, board_evals, outcomes, positions):
+        """
+        Adds the rows of several boards: their (N, 11) metrics, N outcomes and (N, 32) playable squares
+        """
+        rows = np.empty((len(outcomes), NUM_COLUMNS), dtype=ROW_DTYPE)
+        rows[:, :NUM_METRICS] = board_evals
+        rows[:, OUTCOME_COLUMN] = outcomes
+        rows[:, POSITION_COLUMNS] = positions
+        self.add_raw_rows(rows)
+
+    def add_raw_rows(self, rows):
+        """
+        Adds complete (N, NUM_COLUMNS) rows, e.g. read from another dataset's shards
+        """
+        start = 0
+        while start < len(rows):
+            count = min(len(rows) - start, len(self.block) - self.num_rows)
+            self.block[self.num_rows:self.num_rows + count] = rows[start:start + count]
+            self.num_rows += count
+            start += count
+            if self.num_rows == len(self.block):
+                self.flush()
+
+    def flush(self):
+        if self.num_rows == 0:
+            return
+        np.save(get_shard_path(self.directory, self.next_shard, self.prefix), self.block[:self.num_rows])
+        self.next_shard += 1
+        self.total_rows += self.num_rows
+        self.num_rows = 0
+
+    def close(self):
+        self.flush()
+
+
+def get_shard_path(directory, shard_number, prefix=DEFAULT_PREFIX):
+    return os.path.join(directory, f"{prefix}_{shard_number:05d}.npy")
+
+
+def get_shard_paths(directory, prefix=DEFAULT_PREFIX):
+    """
+    Returns the paths of the shards written by a DatasetWriter with the given prefix, in the order they were written
+    """
+    return sorted(glob.glob(os.path.join(directory, f"{prefix}_{'[0-9]' * 5}.npy")))
+
+
+def load_dataset(directory, mmap_mode='r'):
+    """
+    Returns the rows of all the shards of a dataset directory, in order. The shards are memory-mapped by default,
+    only the concatenation is read into memory.
+    """
+    shards = [np.load(path, mmap_mode=mmap_mode) for path in get_shard_paths(directory)]
+    if not shards:
+        return np.empty((0, NUM_COLUMNS), dtype=ROW_DTYPE)
+    return np.concatenate(shards)
+
+
+def export_csv(directory, evals_filename, positions_filename):
+    """
+    Writes the dataset's rows as the board_evals.csv (metrics and outcome) and board_positions.csv (playable
+    squares) files the training scripts read, one shard at a time
+    """
+    with open(evals_filename, "w") as evals_file, open(positions_filename, "w") as positions_file:
+        for path in get_shard_paths(directory):
+            rows = np.load(path, mmap_mode='r')
+            np.savetxt(evals_file, rows[:, :OUTCOME_COLUMN + 1], fmt='%d', delimiter=',')
+            np.savetxt(positions_file, rows[:, POSITION_COLUMNS], fmt='%d', delimiter=',')
@@ -15,9 +15,12 @@ checkers_directory = os.path.join(parent_directory, 'checkers')
 sys.path.append(checkers_directory)
 
 
-class GameParser:
-    filename = "board_evals.csv"
+# Playable squares of an 8x8 board array, in the order of the bitboard indices: row by row, the squares whose row and
+# column have different parities
+PLAYABLE_SQUARES = (np.arange(8)[:, None] + np.arange(8)) % 2 == 1
+
 
+class GameParser:
     def __init__(self):
         self.board_array = np.array([
             [0, 1, 0, 1, 0, 1, 0, 1],
@@ -31,11 +34,13 @@ class GameParser:
         ])
 
     @staticmethod
-    def parse_game(game_record):
+    def parse_game(game_record, dataset_writer):
         game_parser = GameParser()
         # Split the game_record string using any whitespace character
         game_record = re.split(r'\s+', game_record)
         game_outcome = GameParser.parse_outcome(game_record[-1])
+        # The boards of the whole game are evaluated together
+        boards, outcomes = [], []
 
         for i in range(0, len(game_record) - 1, 3):
             black_move, white_move = game_record[i + 1], game_record[i + 2]
@@ -43,12 +48,28 @@ class GameParser:
             if black_move == game_record[-1]:
                 break
             game_parser.parse_move(black_move)
-            game_parser.evaluate_and_add_to_file(game_outcome, reverse=False)
+            game_parser.add_board(boards, outcomes, game_outcome, reverse=False)
 
             if white_move == game_record[-1]:
                 break
             game_parser.parse_move(white_move)
-            game_parser.evaluate_and_add_to_file(game_outcome, reverse=True)
+            game_parser.add_board(boards, outcomes, game_outcome, reverse=True)
+
+        GameParser.evaluate_and_add_to_dataset(boards, outcomes, dataset_writer)
+
+    @staticmethod
+    def count_plies(game_record):
+        """"
+        Returns the number of boards parse_game adds for a game, without playing its moves
+        """
+        game_record = re.split(r'\s+', game_record)
+        num_plies = 0
+        for i in range(0, len(game_record) - 1, 3):
+            for move in game_record[i + 1:i + 3]:
+                if move == game_record[-1]:
+                    return num_plies
+                num_plies += 1
+        return num_plies
 
     def parse_move(self, move):
         if 'x' in move:
@@ -104,21 +125,25 @@ class GameParser:
 
         return prev_pawn_value
 
-    def evaluate_and_add_to_file(self, game_outcome, reverse):
-        board = self.board_array
+    def add_board(self, boards, outcomes, game_outcome, reverse):
+        board = self.board_array.copy()
         outcome = game_outcome
         if reverse:
             board = board_evaluator.reverse(board)
             outcome = -1 * outcome
 
-        arr = board_evaluator.get_metrics(board)
-        arr = np.append(arr, outcome)
-        arr_str = np.array2string(arr, separator=',', max_line_width=np.inf)
-        cleaned_str = re.sub(r'\s+|\[|]', '', arr_str)
+        boards.append(board)
+        outcomes.append(outcome)
 
-        with open(GameParser.filename, "a") as file:
-            # Add a new line to the file
-            file.write(cleaned_str + '\n')
+    @staticmethod
+    def evaluate_and_add_to_dataset(boards, outcomes, dataset_writer):
+        if not boards:
+            return
+
+        boards = np.array(boards)
+        # The 32 playable squares of each board are saved with its metrics, for the occupancy network
+        dataset_writer.add_rows(board_evaluator.get_metrics_batch(boards), np.array(outcomes),
+                                boards[:, PLAYABLE_SQUARES])
 
     @staticmethod
     def parse_outcome(game_outcome):
@@ -1,32 +1,32 @@
-import re
 import os
-import string
-from game_parser import GameParser
-
-# Get the current directory of the script
-script_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Change the working directory to the script's directory
-os.chdir(script_dir)
-
-# Read the input file
-with open('OCA_2.0.pdn', 'r') as infile:
-    data = infile.read()
-
-# Ignore lines starting with '['
-lines = data.split('\n')
-filtered_lines = [line for line in lines if not line.startswith('[')]
-filtered_data = '\n'.join(filtered_lines)
-
-# Use regular expressions to find and remove content between '{' and '}', inclusive
-pattern = r'\{[^}]*\}\s*'
-modified_data = re.sub(pattern, '', filtered_data)
-
-# Write the modified content to an output file
-with open('new_OCA_2.0.pdn', 'w') as outfile:
-    outfile.write(modified_data)
-
-game_records = modified_data.split('\n\n')
-
-for game_record in game_records:
-    GameParser.parse_game(game_record.rstrip(string.whitespace))
+import argparse
+from dataset_builder import build_dataset
+from dataset_writer import export_csv
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="Builds the boards dataset from a PDN database")
+    # The games are read one at a time, without their headers and comments, so the database is never fully in
+    # memory. It may be gzip compressed.
+    argument_parser.add_argument("pdn_path", nargs="?", help="PDN database, OCA_2.0.pdn next to this script by default")
+    argument_parser.add_argument("--workers", type=int, default=1, help="number of parsing processes")
+    argument_parser.add_argument("--csv", action="store_true",
+                                 help="also export board_evals.csv and board_positions.csv")
+    argument_parser.add_argument("--rebuild", action="store_true",
+                                 help="build the dataset from scratch instead of adding the database's new games")
+    arguments = argument_parser.parse_args()
+    # A given path is relative to the current directory, the default database is looked up in the script's one
+    pdn_path = os.path.abspath(arguments.pdn_path) if arguments.pdn_path else "OCA_2.0.pdn"
+
+    # Get the current directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Change the working directory to the script's directory
+    os.chdir(script_dir)
+
+    # The boards' rows are saved in .npy shards, board_evals.csv and board_positions.csv are only written with --csv.
+    # The games already in the dataset aren't parsed again, so a database can be added to it, or a build resumed.
+    dataset_directory = "dataset"
+    build_dataset(pdn_path, dataset_directory, arguments.workers, arguments.rebuild)
+
+    if arguments.csv:
+        export_csv(dataset_directory, "board_evals.csv", "board_positions.csv")
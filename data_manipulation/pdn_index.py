@@ -0,0 +1,141 @@
+import io
+import os
+import re
+import sys
+import mmap
+import numpy as np
+
+from game_parser import GameParser
+from pdn_reader import PDN_ENCODING, hash_game_record, is_gzip_file, open_pdn, read_game_records, read_game_spans
+
+# One entry per game: the byte offset and length of its text in the PDN file (headers and comments included), its
+# outcome for white (1, 0 or -1), its number of plies, i.e. of boards it adds to the dataset, and the hash of its
+# move record
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u4'), ('result', 'i1'), ('plies', '<u2'), ('hash', '<u8')])
+INDEX_SUFFIX = ".index.npz"
+
+
+class PdnIndex:
+    """
+    Sidecar index of the games of an uncompressed PDN file, which is memory-mapped so that any game, or range of
+    consecutive games, is read directly from its byte offset. Used as a context manager, the file is unmapped on
+    exit.
+    """
+
+    def __init__(self, pdn_path, index_path=None):
+        self.pdn_path = pdn_path
+        self.index_path = index_path or get_index_path(pdn_path)
+        self.games = load_index(pdn_path, self.index_path)
+        if self.games is None:
+            self.games = build_index(pdn_path, self.index_path)
+        self.ply_offsets = np.concatenate(([0], np.cumsum(self.games['plies'], dtype=np.int64)))
+        self.file = open(pdn_path, 'rb')
+        # mmap can't map an empty file
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.games.size else b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.games)
+
+    def get_ply_count(self, start=0, stop=None):
+        """
+        Returns the number of plies of the games in [start, stop)
+        """
+        stop = len(self) if stop is None else stop
+        return int(self.ply_offsets[stop] - self.ply_offsets[start])
+
+    def get_game(self, game_number):
+        """
+        Returns the move record of a game, as read_games yields it
+        """
+        return self.get_games(game_number, game_number + 1)[0]
+
+    def get_games(self, start, stop):
+        """
+        Returns the move records of the games in [start, stop). Consecutive games are contiguous in the file, so
+        the range is read at once.
+        """
+        stop = min(stop, len(self))
+        if start >= stop:
+            return []
+        games = self.games[start:stop]
+        begin = int(games['offset'][0])
+        end = int(games['offset'][-1]) + int(games['length'][-1])
+        text = self.data[begin:end].decode(PDN_ENCODING)
+        # Each game's text is parsed on its own, a range may include the blank lines and stray text between games
+        return [next(read_game_records(io.StringIO(text[offset - begin:offset - begin + length], newline='')))
+                for offset, length in zip(games['offset'].tolist(), games['length'].tolist())]
+
+    def split_by_plies(self, num_ranges):
+        """
+        Returns up to num_ranges (start, stop) ranges of consecutive games, which cover all the games with about
+        the same number of plies each
+        """
+        targets = self.ply_offsets[-1] * np.arange(1, num_ranges) / num_ranges
+        bounds = np.searchsorted(self.ply_offsets, targets)
+        bounds = np.unique(np.concatenate(([0], bounds, [len(self)])))
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+
+def get_index_path(pdn_path):
+    return f"{pdn_path}{INDEX_SUFFIX}"
+
+
+def build_index(pdn_path, index_path=None):
+    """
+    Indexes the games of an uncompressed PDN file in one pass and saves the index next to it, or at index_path.
+
+    Returns the index's entries.
+    """
+    if is_gzip_file(pdn_path):
+        raise ValueError(f"{pdn_path} is gzip compressed, only an uncompressed PDN file can be indexed by offset")
+    file_stat = os.stat(pdn_path)
+    with open_pdn(pdn_path) as stream:
+        # latin-1 maps each byte to a character and the line endings are kept, so the offsets are byte offsets
+        games = np.array([(offset, length, GameParser.parse_outcome(re.split(r'\s+', game_record)[-1]),
+                           GameParser.count_plies(game_record), hash_game_record(game_record))
+                          for offset, length, game_record in read_game_spans(stream)], dtype=INDEX_DTYPE)
+    # The file's size and modification time tell whether the index is stale
+    np.savez(index_path or get_index_path(pdn_path), games=games, file_size=file_stat.st_size,
+             file_mtime=file_stat.st_mtime_ns)
+    return games
+
+
+def load_index(pdn_path, index_path=None):
+    """
+    Returns the saved index's entries, or None if there's no index, or the PDN file or the index's format changed
+    since it was built
+    """
+    index_path = index_path or get_index_path(pdn_path)
+    if not os.path.exists(index_path):
+        return None
+    file_stat = os.stat(pdn_path)
+    with np.load(index_path) as index:
+        if index['file_size'] != file_stat.st_size or index['file_mtime'] != file_stat.st_mtime_ns or \
+                index['games'].dtype != INDEX_DTYPE:
+            return None
+        return index['games']
+
+
+if __name__ == "__main__":
+    # python pdn_index.py database.pdn [game_number]: indexes the database if needed, then prints a game's record
+    # or the index's totals
+    with PdnIndex(sys.argv[1]) as pdn_index:
+        if len(sys.argv) > 2:
+            game_number = int(sys.argv[2])
+            entry = pdn_index.games[game_number]
+            print(f"Game {game_number}: bytes {entry['offset']}-{entry['offset'] + entry['length']}, "
+                  f"result {entry['result']}, {entry['plies']} plies")
+            print(pdn_index.get_game(game_number))
+        else:
+            print(f"{len(pdn_index)} games, {pdn_index.get_ply_count()} plies, index saved in {pdn_index.index_path}")
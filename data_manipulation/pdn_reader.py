@@ -0,0 +1,116 @@
+import io
+import os
+import gzip
+import hashlib
+
+GZIP_MAGIC = b'\x1f\x8b'
+# PDN databases predate UTF-8, latin-1 decodes any byte and the move records are ASCII anyway. It also maps each
+# byte to a single character, so that with the line endings left untranslated, offsets in the text are byte offsets.
+PDN_ENCODING = "latin-1"
+
+
+def read_games(source):
+    """
+    Yields the move records of the games of a PDN database one at a time, without their [headers] and {comments}.
+
+    source is the path of a PDN file, gzip compressed or not, or an open text or binary (e.g. gzip.open) stream.
+    Only the current game is held in memory.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open_pdn(source) as stream:
+            yield from read_game_records(stream)
+    else:
+        if not isinstance(source, io.TextIOBase):
+            source = io.TextIOWrapper(source, encoding=PDN_ENCODING, newline='')
+        yield from read_game_records(source)
+
+
+def open_pdn(path):
+    """
+    Opens a PDN file as a text stream, decompressing it if it starts with the gzip magic number
+    """
+    if is_gzip_file(path):
+        return gzip.open(path, 'rt', encoding=PDN_ENCODING, newline='')
+    return open(path, 'r', encoding=PDN_ENCODING, newline='')
+
+
+def is_gzip_file(path):
+    with open(path, 'rb') as file:
+        return file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+
+def read_game_records(stream):
+    """
+    Yields the records of the games of a PDN text stream, the games being separated by blank lines
+    """
+    for _, _, game_record in read_game_spans(stream):
+        yield game_record
+
+
+def read_game_spans(stream):
+    """
+    Yields the games of a PDN text stream as (offset, length, record) tuples: the span of the game's text in the
+    stream, from its first header to its last move, and its move record
+    """
+    record_parts = []
+    in_comment = False
+    offset = 0
+    game_start = game_end = None
+    for line in stream:
+        line_start = offset
+        offset += len(line)
+        if not in_comment:
+            # A blank line ends the current game, the next one starts at the next line that isn't blank
+            if not line.strip():
+                if record_parts:
+                    yield game_start, game_end - game_start, ' '.join(record_parts)
+                    record_parts = []
+                    game_start = None
+                continue
+            if game_start is None:
+                game_start = line_start
+            game_end = offset
+            # Lines starting with '[' are headers
+            if line.startswith('['):
+                continue
+        else:
+            game_end = offset
+
+        line, in_comment = strip_comments(line, in_comment)
+        line = line.strip()
+        if line:
+            record_parts.append(line)
+
+    if record_parts:
+        yield game_start, game_end - game_start, ' '.join(record_parts)
+
+
+def hash_game_record(game_record):
+    """"
+    Returns a 64-bit hash of a game's move record, which identifies the game whatever its headers and comments
+    """
+    return int.from_bytes(hashlib.blake2b(game_record.encode(PDN_ENCODING), digest_size=8).digest(), 'little')
+
+
+def strip_comments(line, in_comment):
+    """"
+    Returns the line with its {comments} replaced by spaces, and whether a comment is still open at its end
+    """
+    parts = []
+    position = 0
+    while position < len(line):
+        if in_comment:
+            end = line.find('}', position)
+            if end == -1:
+                break
+            position = end + 1
+            in_comment = False
+        else:
+            start = line.find('{', position)
+            if start == -1:
+                parts.append(line[position:])
+                break
+            parts.append(line[position:start])
+            position = start + 1
+            in_comment = True
+    return ' '.join(parts), in_comment